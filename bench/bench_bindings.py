@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""measures config lines per second through parseOptions for a config
+dominated by a few hot options, against binding via inspect.signature on
+every line"""
+import os
+import sys
+import time
+import inspect
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "src"))
+
+from cli.options import option, parseOptions, tokenizeFile
+
+
+@option
+def host(name, port: int = 80):
+	pass
+
+
+@option
+def limit(key, value: float):
+	pass
+
+
+@option
+def tags(*values: str):
+	pass
+
+
+hot = {"host": host, "limit": limit, "tags": tags}
+lines = (
+  "host node{i}.example {i}\n",
+  "host node{i}.example\n",
+  "limit rate{i} 1.{i}\n",
+  "tags a b c {i}\n",
+)
+
+
+def bind_inspect(args):
+	# per-line binding as loadOptions did it before binding plans
+	cmd = hot[args[0]]
+	args = args[1:]
+	binding = list()
+	for k, param in inspect.signature(cmd).parameters.items():
+		if (param.kind == inspect.Parameter.POSITIONAL_ONLY or
+		    param.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD):
+			if len(args) < 1:
+				binding.append(param.default)
+			else:
+				if param.annotation != inspect.Parameter.empty:
+					binding.append(param.annotation(args[0]))
+				else:
+					binding.append(args[0])
+				args = args[1:]
+		elif param.kind == inspect.Parameter.VAR_POSITIONAL:
+			if param.annotation != inspect.Parameter.empty:
+				for arg in args:
+					binding.append(param.annotation(arg))
+			else:
+				binding += args
+			args = list()
+	return binding
+
+
+def main():
+	n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+	with tempfile.TemporaryDirectory() as dn:
+		fn = os.path.join(dn, "bench.cfg")
+		with open(fn, "w") as f:
+			for i in range(n_lines):
+				f.write(lines[i % len(lines)].format(i=i))
+
+		tokens = list(tokenizeFile(fn))
+
+		t0 = time.perf_counter()
+		for lidx, args in tokens:
+			bind_inspect(args)
+		t_inspect = time.perf_counter() - t0
+
+		t0 = time.perf_counter()
+		for _ in parseOptions(fn):
+			pass
+		t_parse = time.perf_counter() - t0
+
+		t0 = time.perf_counter()
+		for _ in tokenizeFile(fn):
+			pass
+		t_tokenize = time.perf_counter() - t0
+
+	t_bind = max(t_parse - t_tokenize, 1e-9)
+	print(f"lines: {n_lines}")
+	print(f"binding via inspect: {n_lines/t_inspect:,.0f} lines/s")
+	print(f"binding plans:       {n_lines/t_bind:,.0f} lines/s")
+	print(f"parseOptions total:  {n_lines/t_parse:,.0f} lines/s")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""measures the wall time of `import cli` in fresh interpreters"""
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+fn_src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def run(script, env, repeat):
+	best = None
+	for _ in range(repeat):
+		t0 = time.perf_counter()
+		subprocess.run((sys.executable, script), env=env, check=True)
+		dt = time.perf_counter() - t0
+		best = dt if best is None else min(best, dt)
+	return best
+
+
+def main():
+	repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+	env = dict(os.environ)
+	env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+	with tempfile.TemporaryDirectory() as dn:
+		fn_bare = os.path.join(dn, "bare.py")
+		fn_cli = os.path.join(dn, "with_cli.py")
+		with open(fn_bare, "w") as f:
+			f.write(f"import sys\nsys.path.insert(0, {fn_src!r})\n")
+		with open(fn_cli, "w") as f:
+			f.write(f"import sys\nsys.path.insert(0, {fn_src!r})\nimport cli\n")
+
+		# warm up bytecode caches
+		run(fn_cli, env, 1)
+
+		t_bare = run(fn_bare, env, repeat)
+		t_cli = run(fn_cli, env, repeat)
+
+		proc = subprocess.run((sys.executable, "-X", "importtime", fn_cli),
+		                      env=env,
+		                      stderr=subprocess.PIPE,
+		                      universal_newlines=True,
+		                      check=True)
+
+	modules = list()
+	for ln in proc.stderr.splitlines():
+		parts = ln.split("|")
+		if len(parts) != 3 or not parts[1].strip().isdigit(): continue
+		modules.append(parts[2].strip())
+
+	print(f"interpreter: {t_bare*1e3:.1f} ms  with import cli: {t_cli*1e3:.1f} ms  "
+	      f"import cost: {(t_cli-t_bare)*1e3:.1f} ms")
+	print(f"modules imported by cli: {len(modules)}")
+	print("  " + " ".join(modules))
+
+
+if __name__ == "__main__":
+	main()
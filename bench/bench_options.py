@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""compares the config tokenizer with shlex.split on every line, on a
+generated config of realistic option lines"""
+import os
+import sys
+import time
+import shlex
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "src"))
+
+from cli.options import tokenizeFile
+
+lines = (
+  "server_name example-{i}.internal\n",
+  "listen 0.0.0.0 {i} # port\n",
+  "path \"/srv/data dir/{i}\" '/var/cache/{i}'\n",
+  "# comment line {i}\n",
+  "\n",
+  "tags alpha beta gamma delta {i}\n",
+  "escaped a\\ b\\\"c \"d\\\"e\" {i}\n",
+)
+
+
+def main():
+	n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+	with tempfile.TemporaryDirectory() as dn:
+		fn = os.path.join(dn, "bench.cfg")
+		with open(fn, "w") as f:
+			for i in range(n_lines):
+				f.write(lines[i % len(lines)].format(i=i))
+
+		t0 = time.perf_counter()
+		ref = list()
+		with open(fn, "r") as f:
+			for lidx, ln in enumerate(f, 1):
+				args = shlex.split(ln, comments=True)
+				if len(args) > 0:
+					ref.append((lidx, args))
+		t_shlex = time.perf_counter() - t0
+
+		t0 = time.perf_counter()
+		res = list(tokenizeFile(fn))
+		t_regex = time.perf_counter() - t0
+
+	if res != ref:
+		sys.exit("tokens differ")
+
+	print(f"lines: {n_lines}  shlex: {t_shlex:.2f} s  tokenizeFile: {t_regex:.2f} s  "
+	      f"speedup: {t_shlex/t_regex:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""measures the per-token parse cost of CLINode.process on a synthetic tree,
+against dispatch via inspect.signature on every handler call"""
+import os
+import sys
+import time
+import inspect
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "src"))
+
+from cli.core import CLINode
+
+
+def build(n_switches):
+	node = CLINode("bench")
+	variables = list()
+	for i in range(n_switches):
+		variables.append(node.Variable(int, 0, None, f"opt{i}"))
+	flag = node.FlagCount("v", "verbose")
+	args = node.ArgListVariable(str, "inputs")
+	return node, variables, flag, args
+
+
+def process_inspect(node, argv):
+	# per-token binding as process did it before dispatch plans
+	i_argument = 0
+	cmd = None
+	params = None
+	subargs = list()
+
+	def set_command(func):
+		params = inspect.signature(func).parameters
+		if len(params) < 1:
+			func()
+			return None, None
+		subargs.clear()
+		return func, tuple(params.items())
+
+	for arg in argv[1:]:
+		if arg[:2] == "--":
+			cmd, params = set_command(node.long_commands[arg[2:]])
+			continue
+		elif arg[:1] == "-":
+			for id in arg[1:]:
+				cmd, params = set_command(node.short_commands[id])
+			continue
+		elif cmd is None:
+			cmd, params = set_command(node.arguments[min(i_argument,
+			                                             len(node.arguments) - 1)])
+			i_argument += 1
+
+		key, param = params[len(subargs)]
+		if param.annotation != inspect.Parameter.empty:
+			arg = param.annotation(arg)
+		subargs.append(arg)
+		if len(subargs) == len(params):
+			cmd(*subargs)
+			cmd = None
+
+
+def make_argv(n_switches, n_tokens):
+	argv = ["bench"]
+	i = 0
+	while len(argv) < n_tokens:
+		argv += (f"--opt{i % n_switches}", str(i), "-v", f"input{i}")
+		i += 1
+	return argv
+
+
+def main():
+	n_switches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	n_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+	repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+	argv = make_argv(n_switches, n_tokens)
+
+	def measure(run):
+		best = None
+		for _ in range(repeat):
+			node, _, _, _ = build(n_switches)
+			t0 = time.perf_counter()
+			run(node, argv)
+			dt = time.perf_counter() - t0
+			best = dt if best is None else min(best, dt)
+		return best
+
+	t_inspect = measure(process_inspect)
+	t_plans = measure(lambda node, argv: node.process(argv))
+
+	n = len(argv) - 1
+	print(f"switches: {n_switches}  tokens: {n}")
+	print(f"dispatch via inspect: {t_inspect*1e3:.1f} ms  "
+	      f"per token: {t_inspect/n*1e9:.0f} ns")
+	print(f"dispatch plans:       {t_plans*1e3:.1f} ms  "
+	      f"per token: {t_plans/n*1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""measures switch registration and inherited switch lookup in deep
+useParent subcommand trees"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "src"))
+
+from cli.core import CLINode
+
+
+def build(depth, breadth, n_switches):
+	"""returns the root, the names leading to the deepest first-born node and
+	the number of registered switches"""
+	root = CLINode("bench")
+	level = [root]
+	n = 0
+	for d in range(depth + 1):
+		next_level = list()
+		for i_node, node in enumerate(level):
+			for i in range(n_switches):
+				node.Flag(None, f"d{d}n{i_node}s{i}")
+				n += 1
+			if d < depth:
+				for b in range(breadth):
+					next_level.append(node.subcommand(f"c{b}", useParent=True))
+		level = next_level
+	return root, ["c0"] * depth, n
+
+
+def main():
+	depth = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	breadth = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+	n_switches = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+	n_tokens = int(sys.argv[4]) if len(sys.argv) > 4 else 100000
+
+	t0 = time.perf_counter()
+	root, path, n = build(depth, breadth, n_switches)
+	t_build = time.perf_counter() - t0
+
+	# switches registered on the root, looked up from the deepest node
+	argv = ["bench"] + path + [
+	  f"--d0n0s{i % n_switches}" for i in range(n_tokens)
+	]
+	t0 = time.perf_counter()
+	root.process(argv)
+	t_parse = time.perf_counter() - t0
+
+	print(f"depth: {depth}  breadth: {breadth}  switches: {n}")
+	print(f"registration: {t_build/n*1e6:.2f} us/switch  "
+	      f"inherited lookup at depth {depth}: {t_parse/n_tokens*1e9:.0f} ns/token")
+
+
+if __name__ == "__main__":
+	main()
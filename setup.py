@@ -13,7 +13,7 @@ setup(
   url='https://github.com/wagenerp/hakcli',
   maintainer='Peter Wagener',
   maintainer_email='mail@peterwagener.net',
-  python_requires='>=3.5',
+  python_requires='>=3.7',
   classifiers=[
     "Development Status :: 4 - Beta",
     "License :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)",
@@ -1,6 +1,48 @@
 from .core import clex
 from .core import command, argument, subcommand, check, help_printer
 from .core import Flag, FlagCount, Variable, VariableList, ArgVariable, ArgListVariable
-from .core import process, print_help
-from .util import *
-from .options import opex, option, enumerateConfigDir, findWorkdirFile, loadOptions
+from .core import process, print_help, persist_help
+from .core import immediate, independent, resetter, batch
+
+# everything below is loaded on first access (PEP 562) to keep `import cli` cheap
+__lazy = {
+  "opex": ".options",
+  "option": ".options",
+  "enumerateConfigDir": ".options",
+  "findWorkdirFile": ".options",
+  "loadOptions": ".options",
+  "watchOptions": ".options",
+}
+# util only maps its names to its submodules, importing it stays cheap
+from . import util
+__lazy_util = tuple(util.__all__)
+
+__all__ = [
+  "clex", "command", "argument", "subcommand", "check", "help_printer", "Flag",
+  "FlagCount", "Variable", "VariableList", "ArgVariable", "ArgListVariable",
+  "process", "print_help", "persist_help", "immediate", "independent",
+  "resetter", "batch"
+] + list(__lazy) + list(__lazy_util)
+
+
+def __getattr__(name):
+	import importlib
+	if name in __lazy:
+		value = getattr(importlib.import_module(__lazy[name], __name__), name)
+	elif name in __lazy_util:
+		value = getattr(importlib.import_module(".util", __name__), name)
+	else:
+		# submodules, including those of util that `from .util import *` exposed
+		import importlib.util
+		for package in (__name__, f"{__name__}.util"):
+			if name[:1] != "_" and importlib.util.find_spec(f"{package}.{name}"):
+				value = importlib.import_module(f"{package}.{name}")
+				break
+		else:
+			raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
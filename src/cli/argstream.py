@@ -0,0 +1,104 @@
+import os
+import sys
+import stat
+import mmap
+
+max_depth = 64
+
+
+class ArgStream:
+	"""Iterator over command line tokens that response files and --args-from
+	sources can be spliced into. Tokens are pulled one at a time, so the full
+	argument list is never materialized."""
+	def __init__(s, tokens):
+		s._sources = [iter(tokens)]
+
+	def push(s, tokens):
+		if len(s._sources) >= max_depth:
+			raise RecursionError("argument sources nested too deeply")
+		s._sources.append(iter(tokens))
+
+	def __iter__(s):
+		return s
+
+	def __next__(s):
+		while len(s._sources) > 0:
+			try:
+				return next(s._sources[-1])
+			except StopIteration:
+				s._sources.pop()
+		raise StopIteration
+
+
+def _split_mapped(f, delimiter):
+	with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+		pos = 0
+		end = len(mm)
+		while pos < end:
+			i = mm.find(delimiter, pos)
+			if i < 0: i = end
+			yield mm[pos:i]
+			pos = i + 1
+
+
+def _split_stream(f, delimiter, chunk_size=1 << 16):
+	with f:
+		tail = b""
+		while True:
+			chunk = f.read(chunk_size)
+			if not chunk: break
+			items = (tail + chunk).split(delimiter)
+			tail = items.pop()
+			yield from items
+		if tail:
+			yield tail
+
+
+def _decode(records, delimiter):
+	if delimiter == b"\n":
+		for rec in records:
+			if rec[-1:] == b"\r": rec = rec[:-1]
+			if rec: yield os.fsdecode(rec)
+	else:
+		for rec in records:
+			yield os.fsdecode(rec)
+
+
+def read_tokens(fn, delimiter=b"\n"):
+	"""Opens fn (or stdin for '-') and returns a generator of its delimiter-
+	separated tokens. Regular files are memory-mapped, everything else is read
+	in chunks. Empty lines are skipped in newline-delimited mode."""
+
+	if fn == "-":
+		f = os.fdopen(os.dup(sys.stdin.fileno()), "rb", buffering=0)
+	else:
+		f = open(fn, "rb", buffering=0)
+
+	st = os.fstat(f.fileno())
+	if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+		records = _split_mapped(f, delimiter)
+	else:
+		records = _split_stream(f, delimiter)
+
+	return _decode(records, delimiter)
+
+
+def read_records(f, delimiter=b"\n"):
+	"""Generator of the records of the binary stream f, read in chunks as they
+	arrive. Newline-delimited records are the non-empty lines, left to the
+	caller to split. NUL-delimited records are lists of NUL-terminated
+	arguments, each list ending with an empty argument."""
+	fields = _split_stream(f, delimiter)
+	if delimiter == b"\n":
+		yield from _decode(fields, delimiter)
+		return
+
+	args = list()
+	for field in fields:
+		if field:
+			args.append(os.fsdecode(field))
+		else:
+			yield args
+			args = list()
+	if args:
+		yield args
@@ -0,0 +1,96 @@
+"""Completion server answering --options queries from a preloaded CLINode tree.
+
+Start it with `prog --completion-server` and let the shell completion call
+`python3 -m cli.complete prog args... --options` instead of `prog args...
+--options`. Without a running server the client falls back to running the
+program itself."""
+import os
+import sys
+import socket
+
+from .util.misc import recv_all
+
+kind = "complete"
+
+
+def _answer(conn, node, script):
+	# runs in a forked child: the tree is pristine for every query and
+	# handlers triggered by the partial command line cannot leak into it
+	records = recv_all(conn).split(b"\0")
+	cwd, argv = records[0], [os.fsdecode(v) for v in records[1:]]
+	if argv[-1:] != ["--options"]:
+		# only completion queries are answered, the client runs anything else
+		os._exit(1)
+
+	code = 1
+	try:
+		os.chdir(cwd)
+		devnull = os.open(os.devnull, os.O_RDWR)
+		os.dup2(devnull, 0)
+		os.dup2(devnull, 2)
+		os.dup2(conn.fileno(), 1)
+		os.write(1, b"+")
+		node.process([script] + argv)
+		code = 0
+	except SystemExit as e:
+		code = e.code if isinstance(e.code, int) else 1
+	finally:
+		try:
+			sys.stdout.flush()
+		finally:
+			os._exit(code)
+
+
+def serve(node, script=None, idle_timeout=None):
+	"""Listens on the per-user socket for script until idle_timeout seconds pass
+	without a query. Each query is answered by a forked child. When the
+	script's mtime changes the server re-executes itself."""
+	from .util.misc import serve_forking
+
+	if script is None:
+		script = os.path.realpath(sys.modules["__main__"].__file__)
+	serve_forking(script, kind, lambda conn: _answer(conn, node, script),
+	              idle_timeout)
+
+
+def query(script, argv):
+	"""Asks a running server for the completion output of script argv. Returns
+	None if no server answered."""
+	from .util.misc import runtime_socket
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(runtime_socket(script, kind))
+		sock.sendall(b"\0".join([os.fsencode(os.getcwd())] +
+		                        [os.fsencode(v) for v in argv]))
+		sock.shutdown(socket.SHUT_WR)
+		res = recv_all(sock)
+	except OSError:
+		return None
+	finally:
+		sock.close()
+
+	if res[:1] != b"+": return None
+	return res[1:]
+
+
+def main(argv=sys.argv):
+	if len(argv) < 2:
+		sys.stderr.write(f"usage: {argv[0]} SCRIPT [ARGS...]\n")
+		sys.exit(2)
+
+	script, args = argv[1], argv[2:]
+	res = query(script, args)
+	if res is not None:
+		sys.stdout.buffer.write(res)
+		sys.exit(0)
+
+	sys.stdout.flush()
+	try:
+		os.execv(script, [script] + args)
+	except OSError:
+		os.execv(sys.executable, [sys.executable, script] + args)
+
+
+if __name__ == "__main__":
+	main()
@@ -1,34 +1,226 @@
 import sys
 import os
-import textwrap
-import shutil
-import re
 import types
-import inspect
-import io
-from collections import namedtuple, defaultdict
-from . import util
+import itertools
+from collections import namedtuple, deque
+from .argstream import ArgStream, read_tokens, read_records
 
 
 class clex(Exception):
 	pass
 
 
+plan_t = namedtuple(
+  "plan_t", "func ident arity keys converters repeated deferred asynchronous "
+  "immediate independent")
+
+
+def _parameters(func):
+	# plain functions are read from their code object, which avoids importing
+	# inspect; anything with a non-trivial signature takes the slow path
+	if (isinstance(func, types.FunctionType) and
+	    not hasattr(func, "__wrapped__") and not hasattr(func, "__signature__")):
+		code = func.__code__
+		if code.co_kwonlyargcount == 0 and not code.co_flags & 0x0c: # CO_VARARGS|CO_VARKEYWORDS
+			annotations = func.__annotations__
+			return tuple((k, annotations.get(k))
+			             for k in code.co_varnames[:code.co_argcount])
+
+	import inspect
+	return tuple(
+	  (k, None if param.annotation == inspect._empty else param.annotation)
+	  for k, param in inspect.signature(func).parameters.items())
+
+
+def _is_async(func):
+	if isinstance(func, types.FunctionType) and not hasattr(func, "__wrapped__"):
+		return bool(func.__code__.co_flags & 0x80) # CO_COROUTINE
+	import inspect
+	return inspect.iscoroutinefunction(func)
+
+
+def compile_plan(func, repeated=False):
+	params = _parameters(func)
+	converters = tuple(v for k, v in params)
+	deferred = (getattr(func, "deferrable", False) and len(converters) == 1 and
+	            getattr(converters[0], "io_bound", False))
+	return plan_t(func, func.ident, len(params), tuple(k for k, v in params),
+	              converters, repeated, deferred, _is_async(func),
+	              getattr(func, "immediate", False),
+	              getattr(func, "independent", False))
+
+
+def immediate(func):
+	"""Marks a handler that runs while parsing even in two-phase mode, e.g.
+	because it only stores state the checks look at. Must be applied below the
+	command/argument decorator."""
+	func.immediate = True
+	return func
+
+
+def independent(func):
+	"""Marks a handler that does not depend on the handlers before it. In
+	two-phase mode consecutive independent handlers run concurrently on the
+	executor, and calls of an independent async handler are not kept in
+	order but overlap like calls of different handlers. Must be applied
+	below the command/argument decorator."""
+	func.independent = True
+	return func
+
+
+def deferrable(func=None, enabled=True):
+	"""Marks a single-parameter handler that only accumulates its values. If
+	its converter is io_bound, process() may postpone the handler calls and
+	run the conversions concurrently, calling the handler in argument order
+	afterwards. Must be applied below the command/argument decorator."""
+	def wrapper(func):
+		func.deferrable = enabled
+		return func
+
+	if isinstance(func, types.FunctionType):
+		return wrapper(func)
+
+	return wrapper
+
+
+def _convert_deferred(items):
+	res = list()
+	for plan, arg in items:
+		try:
+			res.append((True, plan.converters[0](arg)))
+		except ValueError as e:
+			res.append((False, e))
+	return res
+
+
+# schedule of the two-phase run handed to a process pool, which its forked
+# workers inherit so handlers and arguments need not be pickled
+_forked_schedule = None
+
+
+def _call_forked(i):
+	plan, args = _forked_schedule[i]
+	plan.func(*args)
+
+
+async def _run_async(calls, max_concurrency=None):
+	"""Awaits the coroutines of calls, a sequence of (handler, coroutine),
+	concurrently. Coroutines of the same handler run one after another in
+	sequence order, those with handler None are not ordered. The first
+	exception cancels the remaining ones."""
+	import asyncio
+
+	semaphore = None
+	if max_concurrency is not None:
+		semaphore = asyncio.Semaphore(max_concurrency)
+
+	async def run(predecessor, coro):
+		if predecessor is not None:
+			await asyncio.wait((predecessor, ))
+			if predecessor.cancelled() or predecessor.exception() is not None:
+				coro.close()
+				return
+		if semaphore is None:
+			await coro
+		else:
+			async with semaphore:
+				await coro
+
+	chains = dict()
+	tasks = list()
+	for func, coro in calls:
+		task = asyncio.ensure_future(run(chains.get(func), coro))
+		if func is not None:
+			chains[func] = task
+		tasks.append(task)
+
+	try:
+		await asyncio.gather(*tasks)
+	except BaseException:
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		raise
+
+
+class LazyValues:
+	"""Bounded buffer of converted values for lazy list helpers. Appending pauses
+	the running parser once max_buffer values are pending, also when it is a
+	subcommand inheriting the helper. Iterating drains the buffer and resumes
+	the parse until the arguments are exhausted."""
+	def __init__(s, owner, max_buffer):
+		if max_buffer < 1:
+			raise ValueError("max_buffer must be positive")
+		s._owner = owner
+		s._buffer = deque()
+		s._max_buffer = max_buffer
+		s._count = 0
+
+	def append(s, v):
+		s._buffer.append(v)
+		s._count += 1
+		if len(s._buffer) >= s._max_buffer:
+			(CLINode.active or s._owner).suspend()
+
+	def __len__(s):
+		# number of values received so far, not the number still buffered
+		return s._count
+
+	def __iter__(s):
+		while True:
+			while len(s._buffer) > 0:
+				yield s._buffer.popleft()
+			# the outermost parser resumes the subcommand parsers it waits on
+			node, parser = s._owner, None
+			while node is not None:
+				if node.parsing: parser = node
+				node = node.owner
+			if parser is None: break
+			parser.resume()
+
+
 class CLINode:
-	def __init__(s, name, description=None, parent=None):
+	# bumped by every change to any tree, invalidates cached help texts
+	revision = 0
+	# node whose arguments are being processed, for context-sensitive help
+	active = None
+
+	def __init__(s, name, description=None, parent=None, source=None):
 		s.name = name
 		s.description = description
 		s.parent = parent
-		s.long_commands = dict()
+		s.owner = None
 		s.long_commands = dict()
 		s.short_commands = dict()
+		s._long_trie = None
+		s._long_bktree = None
+		s._heirs = list()
+		if parent is None:
+			s._long_scope = s.long_commands
+			s._short_scope = s.short_commands
+			s._owns_scope = True
+		else:
+			# flattened tables of all visible switches, shared with the parent
+			# until this node registers a switch of its own (copy-on-write)
+			s._long_scope = parent._long_scope
+			s._short_scope = parent._short_scope
+			s._owns_scope = False
+			parent._heirs.append(s)
 		s.subcommand_map = dict()
 		s.commands = list()
 		s.subcommands = list()
 		s.arguments = list()
 		s.help_printers = list()
 		s.checks = list()
+		s.resetters = list()
 		s.instantiated = False
+		s._parser = None
+		s._suspend = False
+		s.validation_workers = 32
+		s.validation_batch = 4096
+		s._source = source
+		s._loading = False
+		s._help_cache = dict()
 
 		s.properties = dict()
 
@@ -36,20 +228,80 @@ class CLINode:
 		return s.properties[k]()
 
 	def hasShortCommand(s, short):
-		if short in s.short_commands: return True
-		if s.parent is not None:
-			if s.parent.hasShortCommand(short): return True
-		return False
+		return short in s._short_scope
 
 	def hasLongCommand(s, long):
-		if long in s.long_commands: return True
-		if s.parent is not None:
-			if s.parent.hasLongCommand(long): return True
-		return False
+		return long in s._long_scope
+
+	def _own_scope(s):
+		if s._owns_scope: return
+		s._owns_scope = True
+		s._share_scope(dict(s._long_scope), dict(s._short_scope))
+
+	def _share_scope(s, long_scope, short_scope):
+		s._long_scope = long_scope
+		s._short_scope = short_scope
+		s._long_trie = s._long_bktree = None
+		for heir in s._heirs:
+			if not heir._owns_scope:
+				heir._share_scope(long_scope, short_scope)
+
+	def _inherit(s, short, long, func):
+		# a switch was registered on an ancestor after this node was created;
+		# nodes sharing their parent's tables see it already
+		if short in s.short_commands: short = None
+		if long in s.long_commands: long = None
+		if short is None and long is None: return
+
+		if s._owns_scope:
+			if short is not None: s._short_scope[short] = func
+			if long is not None: s._long_scope[long] = func
+		if long is not None:
+			s._long_trie = s._long_bktree = None
+
+		for heir in s._heirs:
+			heir._inherit(short, long, func)
 
 	def __bool__(s):
 		return s.instantiated
 
+	@property
+	def path(s):
+		"""names of the nodes from the root down to this one"""
+		if s.owner is None: return (s.name, )
+		return s.owner.path + (s.name, )
+
+	@staticmethod
+	def _changed():
+		CLINode.revision += 1
+
+	def findLongCommand(s, long):
+		"""Resolves a long switch name or an unambiguous prefix of one. Unknown
+		names raise a clex carrying the closest known switches."""
+		cmd = s._long_scope.get(long)
+		if cmd is not None: return cmd
+
+		from .lookup import PrefixTrie, BKTree
+		if s._long_trie is None:
+			s._long_trie = PrefixTrie(s._long_scope)
+
+		n = s._long_trie.count(long)
+		if n == 1:
+			return s._long_scope[s._long_trie.unique(long)]
+		if n > 1:
+			candidates = s._long_trie.complete(long, 6)
+			raise clex(f"ambiguous switch: --{long} could be " +
+			           ", ".join("--" + v for v in candidates[:5]) +
+			           (", ..." if n > 5 else ""))
+
+		if s._long_bktree is None:
+			s._long_bktree = BKTree(s._long_scope)
+		suggestions = s._long_bktree.search(long, max(1, (len(long) + 1) // 3))
+		if len(suggestions) < 1:
+			raise clex(f"unknown switch: --{long}")
+		raise clex(f"unknown switch: --{long}, did you mean " +
+		           " or ".join("--" + v for d, v in suggestions[:3]) + "?")
+
 	def command(s, short, long=None):
 		def wrapper(func):
 			longname = long
@@ -66,14 +318,29 @@ class CLINode:
 			if short is not None:
 				if s.hasShortCommand(short):
 					raise SyntaxError(f"command shorthand {short} redefined")
-				s.short_commands[short] = func
 
 			if longname is not None:
 				if s.hasLongCommand(longname):
 					raise SyntaxError(f"command switch {longname} redefined")
+
+			s._own_scope()
+
+			if short is not None:
+				s.short_commands[short] = func
+				s._short_scope[short] = func
+
+			if longname is not None:
 				s.long_commands[longname] = func
+				s._long_scope[longname] = func
+				if s._long_trie is not None: s._long_trie.add(longname)
+				if s._long_bktree is not None: s._long_bktree.add(longname)
+
+			for heir in s._heirs:
+				heir._inherit(short, longname, func)
 
+			func.plan = compile_plan(func)
 			s.commands.append(func)
+			s._changed()
 			return func
 
 		if isinstance(short, types.FunctionType):
@@ -81,7 +348,7 @@ class CLINode:
 			short = None
 			return wrapper(func)
 
-		if len(short) != 1:
+		if short is not None and len(short) != 1:
 			raise SyntaxError(
 			  f"invalid command shortname ({short}) - must be a single character")
 
@@ -93,17 +360,18 @@ class CLINode:
 			if len(s.arguments) > 0 and s.arguments[-1].repeated:
 				raise SyntaxError("argument added after repeated argument")
 
-			params = inspect.signature(func).parameters
-			if len(params) < 1:
-				raise SyntaxError("argument handlers must take at least one argument")
-
 			func.repeated = repeated
 			if name is not None:
 				func.ident = name
 			else:
 				func.ident = func.__name__
 
+			func.plan = compile_plan(func, repeated)
+			if func.plan.arity < 1:
+				raise SyntaxError("argument handlers must take at least one argument")
+
 			s.arguments.append(func)
+			s._changed()
 			return func
 
 		if isinstance(dummy, types.FunctionType):
@@ -111,14 +379,45 @@ class CLINode:
 
 		return wrapper
 
-	def subcommand(s, name, description=None, useParent=False):
-		if name in s.subcommands:
+	def subcommand(s, name, description=None, useParent=False, source=None):
+		"""Declares a subcommand node. If source is given, the node is populated
+		only when it is first processed or its help is requested: source is
+		either a callable taking the node or an import path
+		'package.module:function' naming one (function defaults to 'setup')."""
+		if name in s.subcommand_map:
 			raise SyntaxError(f"subcommand {name} redefined")
-		scmd = CLINode(name, description, parent=s if useParent else None)
+		scmd = CLINode(name,
+		               description,
+		               parent=s if useParent else None,
+		               source=source)
+		scmd.owner = s
 		s.subcommand_map[name] = scmd
 		s.subcommands.append(scmd)
+		s._changed()
 		return scmd
 
+	@property
+	def loaded(s):
+		return s._source is None
+
+	def load(s):
+		"""Populates the node from its source unless it is loaded. The node only
+		counts as loaded once the source returned, a failed load is retried."""
+		if s._source is None or s._loading: return s
+		s._loading = True
+		try:
+			source = s._source
+			if isinstance(source, str):
+				import importlib
+				modname, _, attr = source.partition(":")
+				source = getattr(importlib.import_module(modname), attr or "setup")
+			source(s)
+			s._source = None
+		finally:
+			s._loading = False
+		s._changed()
+		return s
+
 	def check(s, func):
 		s.checks.append(func)
 		return func
@@ -127,51 +426,327 @@ class CLINode:
 		s.help_printers.append(func)
 		return func
 
-	def process(s, argv=sys.argv):
+	def resetter(s, func):
+		s.resetters.append(func)
+		return func
+
+	def reset(s):
+		"""Returns the tree to its state before process(): helper values go back
+		to their defaults, the resetters of this node and all loaded
+		subcommands are called and cached file system lookups of the path
+		validators are dropped."""
+		from .util.types import clear_stat_cache
+		clear_stat_cache()
+		if s._parser is not None:
+			s._parser.close()
+			s._parser = None
+		s.instantiated = False
+		s._suspend = False
+		if CLINode.active is s:
+			CLINode.active = None
+		for func in s.resetters:
+			func()
+		for node in s.subcommands:
+			if node.loaded:
+				node.reset()
+
+	def batch(s, f=None, delimiter=b"\n", run=None, **kwargs):
+		"""Processes every argument vector read from the binary stream f (stdin
+		by default) in turn, resetting the tree before each. Records are
+		shell-quoted lines, or NUL-terminated arguments ended by an empty one if
+		delimiter is b"\\0". run is called after each record processed without
+		error, the remaining keyword arguments are passed to process. Returns
+		the exit status of every record, e.g. 1 for a clex and 0 for --help."""
+		import shlex
+		if f is None:
+			f = sys.stdin.buffer
+
+		res = list()
+		for rec in read_records(f, delimiter):
+			code = 0
+			try:
+				if isinstance(rec, str):
+					try:
+						rec = shlex.split(rec, comments=True)
+					except ValueError as e:
+						sys.stderr.write(f"\x1b[31;1mError\x1b[30;0m: {e}\n")
+						sys.exit(1)
+					if len(rec) < 1: continue
+				s.reset()
+				s.process(ArgStream(rec), **kwargs)
+				if run is not None:
+					run()
+			except SystemExit as e:
+				code = e.code
+				if code is None:
+					code = 0
+				elif not isinstance(code, int):
+					sys.stderr.write(f"{code}\n")
+					code = 1
+			res.append(code)
+		s.reset()
+		return res
+
+	def process(s,
+	            argv=sys.argv,
+	            max_concurrency=None,
+	            two_phase=False,
+	            executor="thread",
+	            response_files=False,
+	            _schedule=None):
+		"""Parses argv and calls the handlers. Handlers and checks defined with
+		async def are awaited on one event loop: consecutive async calls
+		overlap, at most max_concurrency at a time, while calls of the same
+		handler keep their order unless it is independent and synchronous
+		handlers wait for all earlier async ones to finish.
+
+		With two_phase, only immediate handlers run while parsing. All other
+		calls are recorded and executed in order once the whole command line
+		parsed and the checks passed. Runs of consecutive independent handlers
+		are executed concurrently on executor, which is "thread", "process"
+		(each handler runs in a forked worker, so its side effects on this
+		process are lost) or a concurrent.futures.Executor.
+
+		With response_files, an argument @FILE is replaced by the arguments
+		read from FILE, one per line, and --args-from FILE and --args-from0
+		FILE read newline- or NUL-delimited arguments from FILE, - for stdin."""
+		if (s.owner is None and not isinstance(argv, ArgStream) and
+		    list(argv[1:]) == ["--completion-server"]):
+			# serve before any parsing, every query starts on a pristine tree
+			from .complete import serve
+			serve(s)
+			sys.exit(0)
+
+		if (s.owner is None and not isinstance(argv, ArgStream) and
+		    list(argv[1:]) == ["--zygote-server"]):
+			# serve before any parsing, every worker starts on the client's argv
+			from .zygote import serve
+			argv = serve()
+			if argv is None:
+				sys.exit(0)
+
+		if isinstance(argv, ArgStream):
+			tokens = argv
+		else:
+			tokens = ArgStream(argv[1:])
+
+		s.load()
+		s.instantiated = True
+		s._suspend = False
+		s._parser = s._dispatch(tokens, max_concurrency, two_phase, executor,
+		                        response_files, _schedule)
+		s.resume()
+
+	@property
+	def parsing(s):
+		return s._parser is not None
+
+	def suspend(s):
+		"""Requests the parser to pause after the current handler returns.
+		process() then returns early and the remaining arguments are parsed by
+		subsequent resume() calls."""
+		s._suspend = True
+
+	def resume(s):
+		if s._parser is None: return False
+		CLINode.active = s
+		try:
+			next(s._parser)
+			return True
+		except StopIteration:
+			s._parser = None
+			return False
+
+	def _dispatch(s,
+	              tokens,
+	              max_concurrency=None,
+	              two_phase=False,
+	              executor="thread",
+	              response_files=False,
+	              schedule=None):
 		wysiwyg = False
 
 		i_argument = 0
-		subcommand = None
-		subparams = None
+		plan = None
 		subargs = list()
-
-		s.instantiated = True
+		deferred = list()
+		pool = None
+		awaiting = list()
+		loop = None
+		executor_pool = None
+		owns_schedule = two_phase and schedule is None
+		if owns_schedule:
+			schedule = list()
+
+		def flush_async():
+			nonlocal loop
+			if len(awaiting) < 1: return
+			if loop is None:
+				import asyncio
+				loop = asyncio.new_event_loop()
+			calls = tuple(awaiting)
+			awaiting.clear()
+			loop.run_until_complete(_run_async(calls, max_concurrency))
+
+		def call(plan, args):
+			if plan.asynchronous:
+				# calls of an independent handler need not wait for each other
+				awaiting.append((None if plan.independent else plan.func,
+				                 plan.func(*args)))
+				return
+			flush_async()
+			plan.func(*args)
+
+		def invoke(plan, args):
+			if schedule is not None and not plan.immediate:
+				schedule.append((plan, tuple(args)))
+				return
+			call(plan, args)
+
+		def execute_forked(i, j):
+			# a fresh pool per run: its workers are forked after the schedule
+			# is published and only receive indices into it
+			global _forked_schedule
+			import multiprocessing
+			from concurrent.futures import ProcessPoolExecutor
+
+			sys.stdout.flush()
+			sys.stderr.flush()
+			_forked_schedule = schedule
+			try:
+				with ProcessPoolExecutor(
+				  max_workers=max_concurrency or min(j - i, os.cpu_count() or 1),
+				  mp_context=multiprocessing.get_context("fork")) as pool:
+					futures = [pool.submit(_call_forked, k) for k in range(i, j)]
+					for future in futures:
+						future.result()
+			finally:
+				_forked_schedule = None
+
+		def execute_schedule():
+			nonlocal executor_pool
+			i = 0
+			while i < len(schedule):
+				j = i
+				while (j < len(schedule) and schedule[j][0].independent and
+				       not schedule[j][0].asynchronous):
+					j += 1
+
+				if j - i < 2:
+					call(*schedule[i])
+					i += 1
+					continue
+
+				flush_async()
+				if executor == "process":
+					execute_forked(i, j)
+					i = j
+					continue
+				if executor_pool is None:
+					if executor == "thread":
+						from concurrent.futures import ThreadPoolExecutor
+						executor_pool = ThreadPoolExecutor(max_workers=max_concurrency)
+					else:
+						executor_pool = executor
+				futures = [
+				  executor_pool.submit(plan.func, *args) for plan, args in schedule[i:j]
+				]
+				for future in futures:
+					future.result()
+				i = j
+
+			flush_async()
+
+		def invalid_argument(plan, i, e):
+			return clex(
+			  f"invalid argument for {plan.ident}'s '{plan.keys[i]} param: {e}")
+
+		def flush_deferred():
+			nonlocal pool
+			if len(deferred) < 1: return
+
+			if len(deferred) == 1:
+				results = _convert_deferred(deferred)
+			else:
+				if pool is None:
+					from concurrent.futures import ThreadPoolExecutor
+					pool = ThreadPoolExecutor(max_workers=s.validation_workers)
+				n = -(-len(deferred) // (s.validation_workers * 4))
+				results = itertools.chain.from_iterable(
+				  pool.map(_convert_deferred,
+				           (deferred[i:i + n] for i in range(0, len(deferred), n))))
+
+			try:
+				for (plan, arg), (ok, v) in zip(deferred, results):
+					if not ok:
+						raise invalid_argument(plan, 0, v)
+					invoke(plan, (v, ))
+			finally:
+				deferred.clear()
+
+		def push_source(fn, delimiter=b"\n"):
+			try:
+				tokens.push(read_tokens(fn, delimiter))
+			except OSError as e:
+				raise clex(f"cannot read arguments from {fn}: {e.strerror}")
+			except RecursionError as e:
+				raise clex(f"{e} at {fn}")
 
 		def set_command(cmd):
-			params = inspect.signature(cmd).parameters
-			if len(params) < 1:
-				cmd()
-				return None, None
+			plan = cmd.plan
+			if not plan.deferred:
+				# only unbroken runs of deferred values are batched
+				flush_deferred()
+			if plan.arity < 1:
+				invoke(plan, ())
+				return None
 
 			subargs.clear()
-			return cmd, tuple(params.items())
+			return plan
 
 		def get_argument():
 			if i_argument < len(s.arguments):
 				return set_command(s.arguments[i_argument])
 
-			if len(s.arguments) > 0 and s.arguments[-1].repeated:
+			if len(s.arguments) > 0 and s.arguments[-1].plan.repeated:
 				return set_command(s.arguments[-1])
 
-			return None, None
+			return None
 
 		try:
 
-			for iarg, arg in enumerate(argv[1:], 1):
-				if subcommand is not None:
-					key, param = subparams[len(subargs)]
+			for arg in tokens:
+				if response_files and not wysiwyg and arg[:1] == "@" and len(arg) > 1:
+					push_source(arg[1:])
+					continue
+
+				if response_files and not wysiwyg and (arg == "--args-from" or
+				                                       arg == "--args-from0"):
+					fn = next(tokens, None)
+					if fn is None:
+						raise clex(f"missing argument(s) for {arg}: source")
+					push_source(fn, b"\0" if arg == "--args-from0" else b"\n")
+					continue
+
+				if not wysiwyg and (arg == "--completion-server" or
+				                    arg == "--zygote-server"):
+					raise clex(f"{arg} must be the only argument")
 
 				if not wysiwyg and arg == "--options":
-					if subcommand is not None:
-						if hasattr(subcommand, "options"):
-							print(" ".join(getattr(subcommand, "options")(*subargs)))
-						if hasattr(param, "options"):
-							print(" ".join(param.options()))
+					if plan is not None:
+						if hasattr(plan.func, "options"):
+							print(" ".join(plan.func.options(*subargs)))
+						converter = plan.converters[len(subargs)]
+						if hasattr(converter, "options"):
+							print(" ".join(converter.options()))
 					else:
-						for id in s.short_commands:
+						for id in s._short_scope:
 							print("-" + id)
-						for id in s.long_commands:
+						for id in s._long_scope:
 							print("--" + id)
+						if response_files:
+							print("--args-from")
+							print("--args-from0")
 					sys.exit(0)
 
 				if not wysiwyg and arg[:1] == "-":
@@ -179,84 +754,240 @@ class CLINode:
 						wysiwyg = True
 						continue
 
+					if (arg == "-h" and "h" not in s._short_scope or
+					    arg == "--help" and "help" not in s._long_scope):
+						s.print_help(sys.stdout, recursive=False)
+						sys.exit(0)
+
 					if arg[:2] == "--":
-						id = arg[2:]
-						if not id in s.long_commands:
-							raise clex(f"unknown switch: --{id}")
-						subcommand, subparams = set_command(s.long_commands[id])
+						plan = set_command(s.findLongCommand(arg[2:]))
 						continue
 					else:
 						for id in arg[1:]:
-							if not id in s.short_commands:
+							if not id in s._short_scope:
 								raise clex(f"unknown switch: -{id}")
-							subcommand, subparams = set_command(s.short_commands[id])
+							plan = set_command(s._short_scope[id])
 						continue
-				elif subcommand is None:
+				elif plan is None:
 					if arg in s.subcommand_map:
-						s.subcommand_map[arg].process(argv[iarg:])
+						flush_deferred()
+						flush_async()
+						node = s.subcommand_map[arg]
+						node.process(tokens, max_concurrency, two_phase, executor,
+						             response_files, schedule)
+						# a suspended subcommand suspends this parser too
+						while node.parsing:
+							yield
+							node.resume()
 						break
-					subcommand, subparams = get_argument()
-					if subcommand is None:
+					plan = get_argument()
+					if plan is None:
 						raise clex(f"stray argument: {arg}")
 					i_argument += 1
 
-				if subcommand is not None:
-					key, param = subparams[len(subargs)]
-					annot = param.annotation
-					newarg = arg
-					if annot != inspect._empty:
+				if plan is not None and plan.deferred:
+					deferred.append((plan, arg))
+					plan = None
+					if len(deferred) >= s.validation_batch:
+						flush_deferred()
+					continue
+
+				if plan is not None:
+					converter = plan.converters[len(subargs)]
+					if converter is not None:
 						try:
-							newarg = annot(arg)
+							arg = converter(arg)
 						except ValueError as e:
-							raise clex(
-							  f"invalid argument for {subcommand.ident}'s '{key} param: {e}")
-
-					subargs.append(newarg)
-					if len(subargs) == len(subparams):
-						subcommand(*subargs)
-						subcommand = None
-
-			if subcommand is not None:
+							raise invalid_argument(plan, len(subargs), e)
+
+					subargs.append(arg)
+					if len(subargs) == plan.arity:
+						invoke(plan, subargs)
+						plan = None
+						if s._suspend:
+							s._suspend = False
+							flush_async()
+							yield
+
+			if plan is not None:
 				raise clex(
-				  f"missing argument(s) for {subcommand.ident}: {', '.join(k for k,v in subparams[len(subargs):])}"
+				  f"missing argument(s) for {plan.ident}: {', '.join(plan.keys[len(subargs):])}"
 				)
 
+			flush_deferred()
+			flush_async()
+
 			for check in s.checks:
-				check()
+				res = check()
+				if hasattr(res, "__await__"):
+					awaiting.append((check, res))
+			flush_async()
+
+			if owns_schedule:
+				execute_schedule()
 
 		except clex as e:
-			print_help(sys.stderr)
+			# an invalid argument whose conversion was postponed came first
+			for (plan, arg), (ok, v) in zip(deferred, _convert_deferred(deferred)):
+				if not ok:
+					e = invalid_argument(plan, 0, v)
+					break
+			s.print_help(sys.stderr, recursive=False)
 			sys.stderr.write(f"\x1b[31;1mError\x1b[30;0m: {e}\n")
 			sys.exit(1)
 
-	def print_help(s, f=sys.stdout, indent=0):
-		def translate_annotation(v):
+		finally:
+			if pool is not None:
+				pool.shutdown()
+			for func, coro in awaiting:
+				coro.close()
+			if loop is not None:
+				loop.close()
+			if executor_pool is not None and executor_pool is not executor:
+				executor_pool.shutdown()
+
+	def print_help(s, f=sys.stdout, indent=0, recursive=True):
+		"""Prints the help of this node. Subcommands are included in full if
+		recursive, otherwise only their names and descriptions are listed."""
+		import shutil
+
+		line_width = 80
+		if f == sys.stdout or f == sys.stderr:
+			line_width = shutil.get_terminal_size((line_width, 20)).columns
 
-			if v.annotation == inspect._empty: return ""
-			return ":" + v.annotation.__name__
+		s.load()
+		s._write_help(f, indent, line_width, recursive)
+		if help_store is not None:
+			help_store.save()
+
+	def _write_help(s, f, indent, line_width, recursive=True):
+		import io
+		import textwrap
+
+		f.write(s.render_help(indent, line_width))
+
+		for scmd in s.subcommands:
+			if recursive and scmd.loaded:
+				scmd._write_help(f, indent + (2 if indent > 0 else 1), line_width)
+			else:
+				# not imported yet, a summary avoids importing every subcommand
+				f.write(
+				  scmd.render_help(indent + (2 if indent > 0 else 1), line_width, True))
+
+		wrap = textwrap.TextWrapper(width=line_width, tabsize=2)
+		for printer in s.help_printers:
+			buf = io.StringIO()
+			printer(buf)
+			for ln in buf.getvalue().splitlines():
+				ln = ln.rstrip()
+				lns = ln.lstrip()
+				wrap.initial_indent = wrap.subsequent_indent = ln[:len(ln) - len(lns)]
+				f.write(wrap.fill(lns) + "\n")
+
+	def render_help(s, indent=0, line_width=80, summary=False):
+		"""Help text of this node alone, without its subcommands and help printer
+		output. Cached per (indent, line width) until the tree changes."""
+		key = (indent, line_width, summary)
+		text = None
+		entry = s._help_cache.get(key)
+		if entry is not None and entry[0] == CLINode.revision: return entry[1]
+
+		# revisions are deterministic for a given script, a tree built the same
+		# way in a later run finds its texts under the same key
+		if help_store is not None:
+			text = help_store.get(s.path, key + (CLINode.revision, ))
+
+		if text is None:
+			import io
+			buf = io.StringIO()
+			if summary:
+				s._render_summary(buf, indent, line_width)
+			else:
+				s._render_help(buf, indent, line_width)
+			text = buf.getvalue()
+			if help_store is not None:
+				help_store.put(s.path, key + (CLINode.revision, ), text)
+
+		s._help_cache[key] = (CLINode.revision, text)
+		return text
+
+	def help_index(s):
+		"""HelpIndex over this node and all of its subcommands, built once per tree
+		revision (and kept in the help store if persist_help is enabled)"""
+		from .helpsearch import HelpIndex
+
+		revision = CLINode.revision
+		index = s._help_cache.get("index")
+		if index is not None and index[0] == revision: return index[1]
+
+		entries = None
+		if help_store is not None:
+			entries = help_store.get(s.path, ("index", revision))
+		if entries is not None:
+			index = HelpIndex(tuple(v) for v in entries)
+		else:
+			index = HelpIndex.build(s)
+			if help_store is not None:
+				help_store.put(s.path, ("index", revision), index.entries)
+				help_store.save()
+
+		s._help_cache["index"] = (CLINode.revision, index)
+		return index
+
+	def search_help(s, pattern, f=sys.stdout):
+		import shutil
+		from .util.printers import WrappedPrinter
 
 		line_width = 80
 		if f == sys.stdout or f == sys.stderr:
 			line_width = shutil.get_terminal_size((line_width, 20)).columns
 
-		P0 = util.WrappedPrinter(f, indent + 0)
-		PS0 = util.WrappedPrinter(f, indent + (1 if indent > 0 else 0))
-		PS1 = util.WrappedPrinter(f, indent + (2 if indent > 0 else 1))
-		PS2 = util.WrappedPrinter(f, indent + (3 if indent > 0 else 2))
+		P0 = WrappedPrinter(f, 0, line_width)
+		P1 = WrappedPrinter(f, 1, line_width)
+		hits = s.help_index().search(pattern)
+		for path, ident, doc in hits:
+			if ident == " ".join(path):
+				P0 *= ident
+			else:
+				P0 *= " ".join(path) + " " + ident
+			if doc is not None:
+				P1 *= doc
+		return len(hits)
+
+	def _render_summary(s, f, indent, line_width):
+		from .util.printers import WrappedPrinter
+
+		WrappedPrinter(f, indent, line_width).write(f"{s.name} ...")
+		if s.description is not None:
+			WrappedPrinter(f, indent + 1, line_width).write(s.description)
+
+	def _render_help(s, f, indent, line_width):
+		from .util.printers import WrappedPrinter
+
+		def translate_annotation(v):
+
+			if v is None: return ""
+			return ":" + v.__name__
+
+		P0 = WrappedPrinter(f, indent + 0, line_width)
+		PS0 = WrappedPrinter(f, indent + (1 if indent > 0 else 0), line_width)
+		PS1 = WrappedPrinter(f, indent + (2 if indent > 0 else 1), line_width)
+		PS2 = WrappedPrinter(f, indent + (3 if indent > 0 else 2), line_width)
 
 		with P0 as p:
 			p += f"{s.name}"
 			if len(s.commands) > 0:
 				p += " [options]"
 			for arg in s.arguments:
-				params = inspect.signature(arg).parameters
+				plan = arg.plan
 				p += f" {arg.ident}"
-				if len(params) == 1:
-					k, v = tuple(params.items())[0]
-					p += (translate_annotation(v))
+				if plan.arity == 1:
+					p += (translate_annotation(plan.converters[0]))
 				else:
 					p += ":("
-					p += " ".join(k + translate_annotation(v) for k, v in params.items())
+					p += " ".join(
+					  k + translate_annotation(v)
+					  for k, v in zip(plan.keys, plan.converters))
 					p += ")"
 				if arg.repeated:
 					p += "..."
@@ -281,9 +1012,7 @@ class CLINode:
 					else:
 						p += f"--{cmd.longname}"
 
-					params = inspect.signature(cmd).parameters
-
-					for k, v in params.items():
+					for k, v in zip(cmd.plan.keys, cmd.plan.converters):
 						p += f" {k}{translate_annotation(v)}"
 
 				if cmd.__doc__ is not None:
@@ -291,30 +1020,23 @@ class CLINode:
 
 		if len(s.subcommands) > 0:
 			PS0 *= "Subcommands:"
-			for scmd in s.subcommands:
-				scmd.print_help(f, PS1.indent)
-
-		wrap = textwrap.TextWrapper(width=line_width, tabsize=2)
-		for printer in s.help_printers:
-			buf = io.StringIO()
-			printer(buf)
-			for ln in buf.getvalue().splitlines():
-				ln = ln.rstrip()
-				lns = ln.lstrip()
-				wrap.initial_indent = wrap.subsequent_indent = ln[:len(ln) - len(lns)]
-				f.write(wrap.fill(lns) + "\n")
 
 	def Flag(s, short, long, description=None):
 		class Flag:
 			def __init__(s, owner, short, long, description=None):
 				s._value = False
+				owner.resetter(s.reset)
 
 				@owner.command(short, long)
+				@immediate
 				def _():
 					s._value = True
 
 				_.__doc__ = description
 
+			def reset(s):
+				s._value = False
+
 			@property
 			def value(s):
 				return s._value
@@ -330,13 +1052,18 @@ class CLINode:
 		class FlagCount:
 			def __init__(s, owner, short, long, description=None):
 				s._value = 0
+				owner.resetter(s.reset)
 
 				@owner.command(short, long)
+				@immediate
 				def _():
 					s._value += 1
 
 				_.__doc__ = description
 
+			def reset(s):
+				s._value = 0
+
 			@property
 			def value(s):
 				return s._value
@@ -352,13 +1079,19 @@ class CLINode:
 		class Variable:
 			def __init__(s, owner, type, default, short, long, description=None):
 				s._value = default
+				s._default = default
+				owner.resetter(s.reset)
 
 				@owner.command(short, long)
+				@immediate
 				def _(v: type):
 					s._value = v
 
 				_.__doc__ = description
 
+			def reset(s):
+				s._value = s._default
+
 			@property
 			def value(s):
 				return s._value
@@ -367,22 +1100,49 @@ class CLINode:
 		s.properties[long] = lambda: res.value
 		return res
 
-	def VariableList(s, type, short, long, description=None):
+	def VariableList(s,
+	                 type,
+	                 short,
+	                 long,
+	                 description=None,
+	                 lazy=False,
+	                 max_buffer=256):
 		class VariableList:
-			def __init__(s, owner, type, short, long, description=None):
-				s._values = list()
+			def __init__(s,
+			             owner,
+			             type,
+			             short,
+			             long,
+			             description=None,
+			             lazy=False,
+			             max_buffer=256):
+				s._lazy = lazy
+				s._owner = owner
+				s._max_buffer = max_buffer
+				s.reset()
+				owner.resetter(s.reset)
 
 				@owner.command(short, long)
+				@immediate
+				@deferrable(enabled=not lazy)
 				def _(v: type):
 					s._values.append(v)
 
 				_.__doc__ = description
 
+			def reset(s):
+				if s._lazy:
+					s._values = LazyValues(s._owner, s._max_buffer)
+				else:
+					s._values = list()
+
 			@property
 			def values(s):
+				if s._lazy:
+					return iter(s._values)
 				return s._values
 
-		res = VariableList(s, type, short, long, description)
+		res = VariableList(s, type, short, long, description, lazy, max_buffer)
 		s.properties[long] = lambda: res.values
 		return res
 
@@ -401,8 +1161,10 @@ class CLINode:
 				s._default = default
 				s._isset = False
 				s._name = name
+				owner.resetter(s.reset)
 
 				@owner.argument(name=name)
+				@immediate
 				def _(v: type):
 					s._value = v
 					s._isset = True
@@ -416,6 +1178,10 @@ class CLINode:
 
 				_.__doc__ = description
 
+			def reset(s):
+				s._value = s._default
+				s._isset = False
+
 			@property
 			def value(s):
 				return s._value
@@ -424,16 +1190,35 @@ class CLINode:
 		s.properties[name] = lambda: res.value
 		return res
 
-	def ArgListVariable(s, type, name, description=None, required=False):
+	def ArgListVariable(s,
+	                    type,
+	                    name,
+	                    description=None,
+	                    required=False,
+	                    lazy=False,
+	                    max_buffer=256):
 		ss = s
 
 		class ArgListVariable:
-			def __init__(s, owner, type, name, description=None, required=False):
-				s._values = list()
+			def __init__(s,
+			             owner,
+			             type,
+			             name,
+			             description=None,
+			             required=False,
+			             lazy=False,
+			             max_buffer=256):
+				s._lazy = lazy
+				s._owner = owner
+				s._max_buffer = max_buffer
+				s.reset()
+				owner.resetter(s.reset)
 				s._name = name
 				s._type = type
 
 				@owner.argument(name=name, repeated=True)
+				@immediate
+				@deferrable(enabled=not lazy)
 				def _(v: type):
 					s._values.append(v)
 
@@ -446,15 +1231,37 @@ class CLINode:
 
 				_.__doc__ = description
 
+			def reset(s):
+				if s._lazy:
+					s._values = LazyValues(s._owner, s._max_buffer)
+				else:
+					s._values = list()
+
 			@property
 			def values(s):
+				if s._lazy:
+					return iter(s._values)
 				return s._values
 
-		res = ArgListVariable(s, type, name, description, required)
+		res = ArgListVariable(s, type, name, description, required, lazy,
+		                      max_buffer)
 		s.properties[name] = lambda: res.values
 		return res
 
 
+help_store = None
+
+
+def persist_help(fn=None):
+	"""Keeps rendered help texts in a cache file (by default below
+	XDG_CACHE_HOME) that stays valid as long as the script file is unchanged.
+	Trees that depend on anything besides the script, e.g. the environment or
+	lazily imported modules, should not use this."""
+	global help_store
+	from .helpcache import HelpStore
+	help_store = HelpStore(fn)
+
+
 main = __import__("__main__")
 root = CLINode(os.path.split(sys.argv[0])[1], main.__doc__)
 
@@ -464,6 +1271,8 @@ subcommand = root.subcommand
 process = root.process
 check = root.check
 help_printer = root.help_printer
+resetter = root.resetter
+batch = root.batch
 print_help = root.print_help
 
 Flag = root.Flag
@@ -475,7 +1284,21 @@ ArgListVariable = root.ArgListVariable
 
 
 @command("h", "help")
+@immediate
 def _():
 	"""Print this help text and exit normally"""
-	print_help(sys.stdout)
+	node = CLINode.active
+	if node is None or node is root:
+		print_help(sys.stdout)
+	else:
+		node.print_help(sys.stdout, recursive=False)
 	sys.exit(0)
+
+
+@command(None, "help-search")
+@immediate
+def _(pattern: str):
+	"""Print the options and subcommands whose words start with all of pattern's and exit"""
+	node = CLINode.active
+	if node is None: node = root
+	sys.exit(0 if node.search_help(pattern) > 0 else 1)
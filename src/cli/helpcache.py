@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+
+
+def default_filename(script):
+	from .util.misc import cache_dir, path_digest
+	return cache_dir(f"help-{path_digest(script)}.json")
+
+
+class HelpStore:
+	"""On-disk store of rendered help texts. Entries are keyed on the node path,
+	indent, line width and tree revision, and the whole store is discarded when
+	the script's mtime or size changes."""
+	def __init__(s, fn=None, script=None):
+		if script is None:
+			script = os.path.realpath(sys.modules["__main__"].__file__)
+		if fn is None:
+			fn = default_filename(script)
+		s.fn = fn
+		st = os.stat(script)
+		s._stamp = [st.st_mtime_ns, st.st_size]
+		s._entries = None
+		s._dirty = False
+
+	def _load(s):
+		s._entries = dict()
+		try:
+			with open(s.fn, "r") as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			return
+		if data.get("stamp") == s._stamp:
+			s._entries = data.get("entries", dict())
+
+	@staticmethod
+	def _key(path, key):
+		return "\0".join(path) + "\0" + "\0".join(str(v) for v in key)
+
+	def get(s, path, key):
+		if s._entries is None: s._load()
+		return s._entries.get(s._key(path, key))
+
+	def put(s, path, key, text):
+		if s._entries is None: s._load()
+		s._entries[s._key(path, key)] = text
+		s._dirty = True
+
+	def save(s):
+		if not s._dirty: return
+		from .util.misc import write_replace
+		data = {"stamp": s._stamp, "entries": s._entries}
+		try:
+			write_replace(s.fn, lambda f: json.dump(data, f))
+		except OSError:
+			return
+		s._dirty = False
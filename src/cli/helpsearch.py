@@ -0,0 +1,61 @@
+import re
+import bisect
+
+e_word = re.compile(r"[a-z0-9]+")
+
+
+def words(text):
+	return e_word.findall(text.lower())
+
+
+class HelpIndex:
+	"""Inverted index over the idents and docstrings of a CLINode tree. Query
+	words match indexed words by prefix, all query words must match."""
+	def __init__(s, entries=()):
+		# entry: (node path, ident, doc)
+		s.entries = list()
+		s._postings = dict()
+		s._vocabulary = None
+		for entry in entries:
+			s.add(*entry)
+
+	@classmethod
+	def build(cls, node):
+		res = cls()
+		stack = [node]
+		while len(stack) > 0:
+			node = stack.pop()
+			node.load()
+			path = list(node.path)
+			res.add(path, " ".join(path), node.description)
+			for arg in node.arguments:
+				res.add(path, arg.ident, arg.__doc__)
+			for cmd in node.commands:
+				res.add(path, cmd.ident, cmd.__doc__)
+			stack.extend(reversed(node.subcommands))
+		return res
+
+	def add(s, path, ident, doc):
+		i_entry = len(s.entries)
+		s.entries.append((path, ident, doc))
+		for word in set(words(ident) + words(doc or "")):
+			s._postings.setdefault(word, list()).append(i_entry)
+		s._vocabulary = None
+
+	def search(s, pattern):
+		"""entries matching every word of pattern, in tree order"""
+		if s._vocabulary is None:
+			s._vocabulary = sorted(s._postings)
+
+		hits = None
+		for word in words(pattern):
+			matches = set()
+			i = bisect.bisect_left(s._vocabulary, word)
+			while i < len(s._vocabulary) and s._vocabulary[i].startswith(word):
+				matches.update(s._postings[s._vocabulary[i]])
+				i += 1
+			hits = matches if hits is None else hits & matches
+			if len(hits) < 1: break
+
+		if hits is None: return list()
+		return [s.entries[i] for i in sorted(hits)]
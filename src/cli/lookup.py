@@ -0,0 +1,102 @@
+class PrefixTrie:
+	"""Set of strings answering prefix queries. Every node counts the keys below
+	it, so uniqueness of a prefix is known without enumerating them."""
+	def __init__(s, keys=()):
+		# node: [children, number of keys in subtree, key ending here or None]
+		s._root = [dict(), 0, None]
+		for key in keys:
+			s.add(key)
+
+	def add(s, key):
+		node = s._root
+		path = [node]
+		for c in key:
+			node = node[0].setdefault(c, [dict(), 0, None])
+			path.append(node)
+		if node[2] is not None: return
+		node[2] = key
+		for node in path:
+			node[1] += 1
+
+	def _find(s, prefix):
+		node = s._root
+		for c in prefix:
+			node = node[0].get(c)
+			if node is None: return None
+		return node
+
+	def count(s, prefix):
+		node = s._find(prefix)
+		return 0 if node is None else node[1]
+
+	def unique(s, prefix):
+		"""the only key starting with prefix, None if there are none or several"""
+		node = s._find(prefix)
+		if node is None or node[1] != 1: return None
+		while node[2] is None:
+			node = next(iter(node[0].values()))
+		return node[2]
+
+	def complete(s, prefix, limit=None):
+		"""keys starting with prefix in sorted order, at most limit of them"""
+		res = list()
+		node = s._find(prefix)
+		if node is None: return res
+		stack = [node]
+		while len(stack) > 0 and (limit is None or len(res) < limit):
+			node = stack.pop()
+			if node[2] is not None:
+				res.append(node[2])
+			stack.extend(node[0][c] for c in sorted(node[0], reverse=True))
+		return res
+
+
+def levenshtein(a, b):
+	if len(a) < len(b):
+		a, b = b, a
+	row = list(range(len(b) + 1))
+	for i, ca in enumerate(a, 1):
+		prev, row[0] = row[0], i
+		for j, cb in enumerate(b, 1):
+			prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+	return row[-1]
+
+
+class BKTree:
+	"""Burkhard-Keller tree for nearest-neighbour queries under edit distance,
+	used to suggest switches without comparing against every known one."""
+	def __init__(s, words=(), distance=levenshtein):
+		s._root = None
+		s._distance = distance
+		for word in words:
+			s.add(word)
+
+	def add(s, word):
+		if s._root is None:
+			s._root = (word, dict())
+			return
+		node = s._root
+		while True:
+			d = s._distance(word, node[0])
+			if d == 0: return
+			child = node[1].get(d)
+			if child is None:
+				node[1][d] = (word, dict())
+				return
+			node = child
+
+	def search(s, word, max_distance):
+		"""(distance, word) pairs within max_distance of word, closest first"""
+		res = list()
+		if s._root is None: return res
+		stack = [s._root]
+		while len(stack) > 0:
+			w, children = stack.pop()
+			d = s._distance(word, w)
+			if d <= max_distance:
+				res.append((d, w))
+			for k in range(max(1, d - max_distance), d + max_distance + 1):
+				child = children.get(k)
+				if child is not None:
+					stack.append(child)
+		return sorted(res)
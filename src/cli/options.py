@@ -1,10 +1,18 @@
 import sys
 import types
 import os
-import shlex
+import re
+import mmap
+import time
+import locale
 import inspect
 import logging
+from collections import namedtuple
 __options = dict()
+# option name: binding_t, compiled at registration
+__plans = dict()
+# hash over the signatures of all registered options, None until needed
+__signature = None
 
 logger=logging.getLogger(__name__)
 
@@ -12,24 +20,43 @@ class opex(Exception):
 	pass
 
 
-def option(funcOrName):
-	def check(func):
-		for k, param in inspect.signature(func).parameters.items():
-			if (param.kind == inspect.Parameter.VAR_KEYWORD or
-			    param.kind == inspect.Parameter.KEYWORD_ONLY):
-				raise SyntaxError(
-				  "keyword arguments are not supported for config options")
+# positional: (name, converter or None, default or inspect.Parameter.empty)
+# per parameter, varargs: (name, converter or None) or None
+binding_t = namedtuple("binding_t", "func positional varargs n_params")
+
+
+def compileBinding(func):
+	"""turns the signature of an option function into a binding_t"""
+	positional = list()
+	varargs = None
+	params = inspect.signature(func).parameters
+	for k, param in params.items():
+		converter = None if param.annotation == inspect.Parameter.empty else param.annotation
+		if (param.kind == inspect.Parameter.POSITIONAL_ONLY or
+		    param.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD):
+			positional.append((k, converter, param.default))
+		elif param.kind == inspect.Parameter.VAR_POSITIONAL:
+			varargs = (k, converter)
+		else:
+			raise SyntaxError("keyword arguments are not supported for config options")
+	return binding_t(func, tuple(positional), varargs, len(params))
 
+
+def option(funcOrName):
 	if isinstance(funcOrName, types.FunctionType):
-		check(funcOrName)
-		global __options
+		plan = compileBinding(funcOrName)
+		global __options, __signature
 		__options[funcOrName.__name__] = funcOrName
+		__plans[funcOrName.__name__] = plan
+		__signature = None
 		return funcOrName
 
 	def wrapper(func):
-		check(func)
-		global __options
+		plan = compileBinding(func)
+		global __options, __signature
 		__options[funcOrName] = func
+		__plans[funcOrName] = plan
+		__signature = None
 		return func
 
 	return wrapper
@@ -47,106 +74,864 @@ def enumerateConfigDir(configDir):
 
 	if not os.path.isdir(fn_configDir): return
 
-	for fb in os.listdir(fn_configDir):
+	for fb in sorted(os.listdir(fn_configDir)):
 		fe = os.path.splitext(fb)[1]
 		if fe == ".cfg":
 			yield os.path.join(fn_configDir, fb)
 
 
-def findWorkdirFile(fb, ascend=False) -> (str, str):
-	fn_base = os.getcwd()
+# (cwd, ascend, markers): {marker: (directory, path)}
+__workdirFiles = dict()
+
+
+def clearWorkdirCache():
+	__workdirFiles.clear()
+
+
+def defaultWorkdirCacheFile():
+	from .util.misc import cache_dir
+	return cache_dir("workdir.json")
+
+
+def _scanWorkdir(fn_base, markers, ascend):
+	"""ascends from fn_base, listing every directory once. Returns the nearest
+	directory and path of each marker found and the visited directories with
+	their mtimes."""
+	found = dict()
+	visited = list()
+	# markers with a directory part cannot be seen in a single listing
+	pending = set(m for m in markers if os.sep not in m)
+	nested = set(markers) - pending
 
 	for _ in range(512):
-		fn_cfg = os.path.join(fn_base, fb)
-		logger.debug(f"looking for workdir file {fb} in {fn_cfg}")
-		if os.path.exists(fn_cfg):
-			return fn_base, fn_cfg
-		if not ascend:
-			return os.getcwd(), None
+		logger.debug("looking for workdir files %s in %s", markers, fn_base)
+		try:
+			with os.scandir(fn_base) as it:
+				for entry in it:
+					if entry.name in pending:
+						fn = entry.path
+						if entry.is_symlink() and not os.path.exists(fn): continue
+						found[entry.name] = (fn_base, fn)
+						pending.discard(entry.name)
+			visited.append((fn_base, os.stat(fn_base).st_mtime_ns))
+		except OSError:
+			for m in list(pending):
+				fn = os.path.join(fn_base, m)
+				if os.path.exists(fn):
+					found[m] = (fn_base, fn)
+					pending.discard(m)
+			visited.append((fn_base, None))
+		for m in list(nested):
+			fn = os.path.join(fn_base, m)
+			# the listings that decide whether fn exists change the mtimes of its
+			# existing ancestors below fn_base, whose own mtime is recorded above
+			dn = fn_base
+			for part in os.path.dirname(m).split(os.sep):
+				dn = os.path.join(dn, part)
+				try:
+					visited.append((dn, os.stat(dn).st_mtime_ns))
+				except OSError:
+					break
+			if os.path.exists(fn):
+				found[m] = (fn_base, fn)
+				nested.discard(m)
+
+		if not ascend or (len(pending) < 1 and len(nested) < 1):
+			return found, visited
 		fn_base1 = os.path.dirname(fn_base)
 		if fn_base1 == fn_base:
-			return os.getcwd(), None
+			return found, visited
 		fn_base = fn_base1
 
 	raise RuntimeError("failed to ascend workdir")
 
 
+def _loadWorkdirCache(cacheFile, key):
+	import json
+	try:
+		with open(cacheFile, "r") as f:
+			entry = json.load(f).get(key)
+	except (OSError, ValueError, AttributeError):
+		return None
+	if entry is None: return None
+	for dn, mtime in entry["dirs"]:
+		try:
+			if mtime is None or os.stat(dn).st_mtime_ns != mtime: return None
+		except OSError:
+			return None
+	return {m: tuple(v) for m, v in entry["found"].items()}
+
+
+def _storeWorkdirCache(cacheFile, key, found, visited):
+	import json
+	try:
+		with open(cacheFile, "r") as f:
+			data = json.load(f)
+		if not isinstance(data, dict): data = dict()
+	except (OSError, ValueError):
+		data = dict()
+	data[key] = {"dirs": visited, "found": found}
+	from .util.misc import write_replace
+	try:
+		write_replace(cacheFile, lambda f: json.dump(data, f))
+	except OSError as e:
+		logger.debug("not caching workdir files: %s", e)
+
+
+def findWorkdirFiles(markers, ascend=True, cacheFile=None) -> dict:
+	"""Looks for several marker files at once, starting in the working directory.
+	Returns {marker: (directory, path)} for every marker found, with the
+	nearest directory containing it. Results are memoized per working
+	directory and marker set, and with cacheFile (True for the default
+	location below $XDG_CACHE_HOME) also kept on disk for as long as the
+	mtimes of the visited directories are unchanged."""
+	markers = tuple(sorted(set(markers)))
+	fn_base = os.getcwd()
+	key = (fn_base, ascend, markers)
+	res = __workdirFiles.get(key)
+	if res is not None:
+		return dict(res)
+
+	if cacheFile is True:
+		cacheFile = defaultWorkdirCacheFile()
+	if cacheFile is not None:
+		diskKey = "\0".join((fn_base, str(ascend)) + markers)
+		res = _loadWorkdirCache(cacheFile, diskKey)
+
+	if res is None:
+		res, visited = _scanWorkdir(fn_base, markers, ascend)
+		if cacheFile is not None:
+			_storeWorkdirCache(cacheFile, diskKey, res, visited)
+
+	__workdirFiles[key] = res
+	return dict(res)
+
+
+def findWorkdirFile(fb, ascend=False) -> (str, str):
+	res = findWorkdirFiles((fb, ), ascend).get(fb)
+	if res is None:
+		return os.getcwd(), None
+	return res
+
+
+def registrySignature():
+	"""hash over names, parameters and converters of all registered options.
+	Cached config files are only replayed while it is unchanged."""
+	global __signature
+	if __signature is not None: return __signature
+
+	import hashlib
+
+	def describe(v):
+		return f"{getattr(v, '__module__', '')}.{getattr(v, '__qualname__', repr(v))}"
+
+	h = hashlib.sha1()
+	for name in sorted(__plans):
+		plan = __plans[name]
+		h.update(f"{name}\0{describe(plan.func)}\0".encode())
+		for k, converter, default in plan.positional:
+			h.update(f"{k}\0{describe(converter)}\0{default!r}\0".encode())
+		if plan.varargs is not None:
+			h.update(f"*{plan.varargs[0]}\0{describe(plan.varargs[1])}\0".encode())
+	__signature = h.hexdigest()
+	return __signature
+
+
+def defaultCacheDir():
+	from .util.misc import cache_dir
+	return cache_dir("options")
+
+
+def _cacheFile(cacheDir, fn):
+	from .util.misc import path_digest
+	return os.path.join(cacheDir, f"{path_digest(fn)}.pickle")
+
+
+def _cacheKey(fn):
+	st = os.stat(fn)
+	return (os.path.realpath(fn), st.st_size, st.st_mtime_ns, registrySignature())
+
+
+def _loadCached(cacheDir, fn, key):
+	import pickle
+	try:
+		with open(_cacheFile(cacheDir, fn), "rb") as f:
+			data = pickle.load(f)
+	except Exception:
+		return None
+	if not isinstance(data, tuple) or len(data) != 2 or data[0] != key:
+		return None
+	return data[1]
+
+
+def _storeCached(cacheDir, fn, key, bindings):
+	import pickle
+	from .util.misc import write_replace
+	try:
+		write_replace(
+		  _cacheFile(cacheDir, fn),
+		  lambda f: pickle.dump((key, bindings), f, protocol=pickle.HIGHEST_PROTOCOL),
+		  "wb")
+	except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+		logger.debug("not caching config %s: %s", fn, e)
+
+
+def _bind(fn, lidx, args, plans=None):
+	def emit_error(msg):
+		raise opex(f"config {fn}:{lidx}: {msg}")
+
+	cmd_name = args[0]
+	plan = (__plans if plans is None else plans).get(cmd_name)
+	if plan is None:
+		emit_error(f"unknown command '{cmd_name}'")
+
+	binding = list()
+	i = 1
+	n = len(args)
+	for k, converter, default in plan.positional:
+		if i >= n:
+			if default is inspect.Parameter.empty:
+				emit_error(f"missing {k} argument for {cmd_name}")
+			binding.append(default)
+		elif converter is None:
+			binding.append(args[i])
+			i += 1
+		else:
+			try:
+				binding.append(converter(args[i]))
+			except ValueError as e:
+				emit_error(f"invalid {k} argument for {cmd_name}: {e}")
+			i += 1
+
+	if i < n:
+		if plan.varargs is None:
+			emit_error(f"too many arguments for {cmd_name}: expected {plan.n_params}, got {plan.n_params+n-i}")
+		k, converter = plan.varargs
+		if converter is None:
+			binding += args[i:]
+		else:
+			try:
+				for arg in args[i:]:
+					binding.append(converter(arg))
+			except ValueError as e:
+				emit_error(f"invalid {k} argument for {cmd_name}: {e}")
+
+	return cmd_name, binding
+
+
+# one token of shlex.split(ln, comments=True) applied to every line: a line
+# break (as in text mode), a comment, a word without quotes or escapes, any
+# other word, or an unterminated quote / escape
+__piece = r"""[^ \t\r\n'"\\#]+|'[^'\r\n]*'|"[^"\\\r\n]*(?:\\[^\r\n][^"\\\r\n]*)*"|\\[^\r\n]"""
+__e_token = re.compile(r"(\r\n|\r|\n)|#[^\r\n]*"
+                       r"""|([^ \t\r\n'"\\#]+)(?=[ \t\r\n#]|\Z)"""
+                       r"|((?:" + __piece + r")+(?:\\(?:\r\n|\r|\n))?|\\(?:\r\n|\r|\n))"
+                       r"""|(['"\\])""")
+__e_quoted = re.compile(r"""'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)""", re.S)
+__e_escaped = re.compile(r'\\(["\\])')
+__e_linebreak = re.compile(r"\r\n|\r|\n")
+
+
+def _unquote_piece(m):
+	if m.group(1) is not None: return m.group(1)
+	if m.group(2) is not None: return __e_escaped.sub(r"\1", m.group(2))
+	return m.group(3)
+
+
+def _unquote(word):
+	if "\\" not in word:
+		# only one kind of quotes: they are all delimiters
+		if "'" not in word: return word.replace('"', "")
+		if '"' not in word: return word.replace("'", "")
+	return __e_quoted.sub(_unquote_piece, word)
+
+
+def tokenizeOptions(text, fn="<config>", encoding=None):
+	"""Generator of (line index, tokens) for every non-empty line of text (str or
+	bytes-like) in one regex pass, giving the same tokens as
+	shlex.split(ln, comments=True) on each line of the file in text mode."""
+	if not isinstance(text, str):
+		text = str(text, encoding or locale.getpreferredencoding(False))
+	lidx = 1
+	tokens = list()
+	# finditer streams, findall would build the matches of the whole text first
+	for m in __e_token.finditer(text):
+		group = m.lastindex
+		if group == 2:
+			tokens.append(m.group(2))
+		elif group == 1:
+			if len(tokens) > 0:
+				yield lidx, tokens
+				tokens = list()
+			lidx += 1
+		elif group == 3:
+			quoted = m.group(3)
+			if quoted[-1] not in "\r\n":
+				tokens.append(_unquote(quoted))
+				continue
+			# escaped line break: it ends up in the token and ends the line
+			tokens.append(_unquote(quoted.rstrip("\r\n")[:-1]) + "\n")
+			yield lidx, tokens
+			tokens = list()
+			lidx += 1
+		elif group == 4:
+			# let shlex word the error for the offending line
+			import shlex
+			lines = __e_linebreak.split(text, lidx)
+			ln = lines[lidx - 1] + ("\n" if len(lines) > lidx else "")
+			try:
+				shlex.split(ln, comments=True)
+				msg = "malformed line"
+			except ValueError as e:
+				msg = str(e)
+			raise opex(f"config {fn}:{lidx}: {msg}")
+	if len(tokens) > 0:
+		yield lidx, tokens
+
+
+def tokenizeFile(fn):
+	"""tokenizeOptions over the memory-mapped contents of fn"""
+	with open(fn, "rb") as f:
+		if os.fstat(f.fileno()).st_size < 1:
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			yield from tokenizeOptions(mm, fn)
+
+
+def _includePaths(fn, paths):
+	"""real paths of the include arguments of a line in fn, with variables and
+	~ expanded and relative to fn's directory"""
+	dn = os.path.dirname(os.path.abspath(fn))
+	return tuple(
+	  os.path.realpath(os.path.join(dn, os.path.expandvars(os.path.expanduser(v))))
+	  for v in paths)
+
+
+def parseOptions(fn, tokens=None, plans=None, resolveIncludes=True):
+	"""Generator of the (line index, option name, converted arguments) of every
+	option line in fn, or of the (line index, tokens) read from it. Errors
+	are raised as opex when their line is reached. Unless an option named
+	include is registered, `include PATH...` lines yield (line index, None,
+	real paths) with paths relative to fn's directory, or the paths as
+	written without resolveIncludes."""
+	if tokens is None:
+		tokens = tokenizeFile(fn)
+	for lidx, args in tokens:
+		if args[0] == "include" and "include" not in __plans:
+			if len(args) < 2:
+				raise opex(f"config {fn}:{lidx}: missing path argument for include")
+			if resolveIncludes:
+				yield lidx, None, _includePaths(fn, args[1:])
+			else:
+				yield lidx, None, tuple(args[1:])
+			continue
+		yield (lidx, ) + _bind(fn, lidx, args, plans)
+
+
+# number of threads reading and tokenizing config files concurrently
+maxReadWorkers = 8
+# real path: (name, signature when read) of every file loadOptions applied
+__loaded = dict()
+
+
+def _fileSignature(fn):
+	try:
+		st = os.stat(fn)
+	except OSError:
+		return None
+	return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class LoadReport:
+	"""Timings of loadOptions in seconds. files maps each file to its read,
+	tokenize, bind (conversion included) times and whether it was replayed
+	from the cache; options and converters map names to [calls, seconds].
+	str() gives a one-line summary."""
+	def __init__(s):
+		import threading
+		s.files = dict()
+		s.options = dict()
+		s.converters = dict()
+		s.total = 0.0
+		s._lock = threading.Lock()
+
+	def addFile(s, fn, read=0.0, tokenize=0.0, cached=False):
+		with s._lock:
+			s.files[fn] = {
+			  "read": read,
+			  "tokenize": tokenize,
+			  "bind": 0.0,
+			  "cached": cached
+			}
+
+	def setParse(s, fn, dt):
+		"""records the time fn took to parse in total, of which what was not
+		spent reading or tokenizing went into binding"""
+		with s._lock:
+			entry = s.files.get(fn)
+			if entry is not None:
+				entry["bind"] = max(0.0, dt - entry["read"] - entry["tokenize"])
+
+	def _add(s, table, name, dt):
+		with s._lock:
+			entry = table.get(name)
+			if entry is None:
+				table[name] = [1, dt]
+			else:
+				entry[0] += 1
+				entry[1] += dt
+
+	def _timed(s, table, name, func):
+		perf_counter = time.perf_counter
+
+		def timed(*args):
+			t0 = perf_counter()
+			try:
+				return func(*args)
+			finally:
+				s._add(table, name, perf_counter() - t0)
+
+		return timed
+
+	def plans(s, plans):
+		"""plans with every converter wrapped to record its time"""
+		res = dict()
+		for name, plan in plans.items():
+			positional = tuple(
+			  (k, None if converter is None else s._timed(
+			    s.converters, getattr(converter, "__qualname__", repr(converter)),
+			    converter), default) for k, converter, default in plan.positional)
+			varargs = plan.varargs
+			if varargs is not None and varargs[1] is not None:
+				varargs = (varargs[0],
+				           s._timed(s.converters,
+				                    getattr(varargs[1], "__qualname__", repr(varargs[1])),
+				                    varargs[1]))
+			res[name] = plan._replace(positional=positional, varargs=varargs)
+		return res
+
+	def handlers(s, options):
+		return {
+		  name: s._timed(s.options, name, func)
+		  for name, func in options.items()
+		}
+
+	def __str__(s):
+		def total(key):
+			return sum(v[key] for v in s.files.values())
+
+		n_cached = sum(1 for v in s.files.values() if v["cached"])
+		t_convert = sum(v[1] for v in s.converters.values())
+		t_handlers = sum(v[1] for v in s.options.values())
+		res = (f"loaded {len(s.files)} config files ({n_cached} cached) in "
+		       f"{s.total:.3f}s: read {total('read'):.3f}s, tokenize "
+		       f"{total('tokenize'):.3f}s, convert {t_convert:.3f}s, handlers "
+		       f"{t_handlers:.3f}s")
+		if len(s.options) > 0:
+			name, (calls, t) = max(s.options.items(), key=lambda v: v[1][1])
+			res += f", slowest option {name} {t:.3f}s in {calls} calls"
+		return res
+
+
+def _timedTokens(fn, report):
+	"""reads and tokenizes fn up front to time both steps, then replays the
+	tokens and the error that ended them"""
+	t0 = time.perf_counter()
+	with open(fn, "rb") as f:
+		if os.fstat(f.fileno()).st_size < 1:
+			text = ""
+		else:
+			with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+				text = str(mm, locale.getpreferredencoding(False))
+	t1 = time.perf_counter()
+	tokens = list()
+	error = None
+	try:
+		for v in tokenizeOptions(text, fn):
+			tokens.append(v)
+	except opex as e:
+		error = e
+	report.addFile(fn, read=t1 - t0, tokenize=time.perf_counter() - t1)
+
+	yield from tokens
+	if error is not None:
+		raise error
+
+
+def _parseFile(fn, cacheDir, report=None):
+	"""returns the entries of fn, the opex ending them and the signature of
+	the file read, or None and the OSError if fn cannot be read. Include
+	entries keep the paths as written, they depend on the environment."""
+	sig = _fileSignature(fn)
+	try:
+		if cacheDir is not None:
+			key = _cacheKey(fn)
+			entries = _loadCached(cacheDir, fn, key)
+			if entries is not None:
+				logger.debug("replaying cached config %s", fn)
+				if report is not None:
+					report.addFile(fn, cached=True)
+				return entries, None, sig
+
+		entries = list()
+		if report is None:
+			parser = parseOptions(fn, resolveIncludes=False)
+		else:
+			parser = parseOptions(fn, _timedTokens(fn, report), report.plans(__plans),
+			                      resolveIncludes=False)
+			t0 = time.perf_counter()
+		try:
+			for lidx, cmd_name, binding in parser:
+				entries.append((lidx, cmd_name, tuple(binding)))
+		except opex as e:
+			return entries, e, sig
+		finally:
+			if report is not None:
+				report.setParse(fn, time.perf_counter() - t0)
+	except OSError as e:
+		return None, e, sig
+
+	if cacheDir is not None:
+		_storeCached(cacheDir, fn, key, entries)
+	return entries, None, sig
+
+
+def _parseGraph(filenames, cacheDir, report=None):
+	"""parses the files and everything they include, each file once. Files
+	discovered in the same round are read concurrently."""
+	results = dict()
+	names = dict()
+	level = list()
+	for fn in filenames:
+		rp = os.path.realpath(fn)
+		if rp not in names:
+			names[rp] = fn
+			level.append(rp)
+
+	pool = None
+	try:
+		while len(level) > 0:
+			if len(level) == 1:
+				parsed = [_parseFile(names[level[0]], cacheDir, report)]
+			else:
+				if pool is None:
+					from concurrent.futures import ThreadPoolExecutor
+					pool = ThreadPoolExecutor(max_workers=maxReadWorkers)
+				parsed = list(
+				  pool.map(lambda rp: _parseFile(names[rp], cacheDir, report), level))
+
+			nextLevel = list()
+			for rp, res in zip(level, parsed):
+				results[rp] = res
+				for lidx, cmd_name, binding in res[0] or ():
+					if cmd_name is not None: continue
+					for inc in _includePaths(names[rp], binding):
+						if inc not in names:
+							names[inc] = inc
+							nextLevel.append(inc)
+			level = nextLevel
+	finally:
+		if pool is not None:
+			pool.shutdown()
+	return results, names
+
+
 def loadOptions(*filenames,
                 workdirFile=None,
                 ascendWorkdir=False,
-                configDir=None):
+                configDir=None,
+                cacheDir=None,
+                report=None):
+	"""Applies the options in the given files, the .cfg files in configDir and
+	the workdir file. Included files are applied where they are first
+	included and skipped afterwards. All files are read and converted before
+	any handler is called, and handlers are called in file order. With
+	cacheDir (True for the default location below $XDG_CACHE_HOME), the
+	converted arguments of each file are cached and replayed while the file's
+	size and mtime and the registered options are unchanged. Converters are
+	not called again for cached files.
+
+	With report (True or a LoadReport), the time spent reading and tokenizing
+	each file, in each converter and in each option's handler is recorded,
+	summarized through the logger and returned."""
+	if report is True:
+		report = LoadReport()
+	if report is not None:
+		t_load = time.perf_counter()
 
 	filenames_actual = list(filenames)
 
 	if configDir is not None:
-		filenames_actual += list(*enumerateConfigDir(configDir))
+		filenames_actual += list(enumerateConfigDir(configDir))
 
 	if workdirFile is not None:
-		logger.debug(f"using workdir file {workdirFile} (ascend: {ascendWorkdir})")
+		logger.debug("using workdir file %s (ascend: %s)", workdirFile,
+		             ascendWorkdir)
 		_, fn = findWorkdirFile(workdirFile, ascendWorkdir)
 		if fn is not None:
 			filenames_actual.append(fn)
+
+	if cacheDir is True:
+		cacheDir = defaultCacheDir()
+
+	filenames_actual = [fn for fn in filenames_actual if os.path.exists(fn)]
+
 	try:
 		global __options
+		results, names = _parseGraph(filenames_actual, cacheDir, report)
+		handlers = __options if report is None else report.handlers(__options)
+		applied = set()
+		stack = list()
+
+		def apply(rp):
+			fn = names[rp]
+			logger.info("processing config %s", fn)
+			applied.add(rp)
+			stack.append(rp)
+			entries, error, sig = results[rp]
+			if entries is None:
+				raise opex(f"cannot read config {fn}: {error.strerror}")
+			__loaded[rp] = (fn, sig)
+			for lidx, cmd_name, binding in entries:
+				if cmd_name is not None:
+					handlers[cmd_name](*binding)
+					continue
+				for inc in _includePaths(fn, binding):
+					if inc in stack:
+						cycle = " -> ".join(names[v] for v in stack[stack.index(inc):] + [inc])
+						raise opex(f"config {fn}:{lidx}: include cycle: {cycle}")
+					if inc in applied: continue
+					if results[inc][0] is None:
+						raise opex(
+						  f"config {fn}:{lidx}: cannot include {inc}: {results[inc][1].strerror}")
+					apply(inc)
+			if error is not None:
+				raise error
+			stack.pop()
+
 		for fn in filenames_actual:
-			logger.info(f"processing config {fn}")
-			if not os.path.exists(fn): continue
-			with open(fn, "r") as f:
-				lidx = 0
-
-				def emit_error(msg):
-					raise opex(f"config {fn}:{lidx}: {msg}")
-
-				for ln in f:
-					lidx += 1
-					args = shlex.split(ln, comments=True)
-
-					if len(args) < 1: continue
-
-					cmd_name = args[0]
-					args = args[1:]
-
-					if cmd_name not in __options:
-						emit_error(f"unknown command '{cmd_name}'")
-
-					cmd = __options[cmd_name]
-					params = inspect.signature(cmd).parameters
-
-					binding = list()
-
-					for k, param in params.items():
-						if (param.kind == inspect.Parameter.POSITIONAL_ONLY or
-						    param.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD):
-							if len(args) < 1:
-								if param.default == inspect.Parameter.empty:
-									emit_error(f"missing {k} argument for {cmd_name}")
-								binding.append(param.default)
-							else:
-								if param.annotation != inspect.Parameter.empty:
-									try:
-										binding.append(param.annotation(args[0]))
-									except ValueError as e:
-										emit_error(f"invalid {k} argument for {cmd_name}: {e}")
-								else:
-									binding.append(args[0])
-								args = args[1:]
-						elif param.kind == inspect.Parameter.VAR_POSITIONAL:
-							if param.annotation != inspect.Parameter.empty:
-								try:
-									for arg in args:
-										binding.append(param.annotation(arg))
-								except ValueError as e:
-									emit_error(f"invalid {k} argument for {cmd_name}: {e}")
-							else:
-								binding += args
-							args = list()
-						else:
-							raise RuntimeError("unexpected parameter kind")
-					
-					if len(args)>0:
-						emit_error(f"too many arguments for {cmd_name}: expected {len(params)}, got {len(params)+len(args)}")
-					
-					cmd(*binding)
+			rp = os.path.realpath(fn)
+			if rp not in applied:
+				apply(rp)
 	except opex as e:
 		logger.error(str(e))
 		sys.exit(1)
+
+	if report is not None:
+		report.total += time.perf_counter() - t_load
+		logger.info("%s", report)
+		return report
+
+
+def loadedFiles():
+	"""{real path: (name, (inode, size, mtime_ns) when read)} of every config
+	file loadOptions applied"""
+	return dict(__loaded)
+
+
+def _markLoaded(rp, fn, sig):
+	__loaded[rp] = (fn, sig)
+
+
+def _applyLine(fn, lidx, text, encoding, include):
+	"""applies the options on one config line, calling include with the real
+	path of every file it includes. Returns the names of the options applied."""
+	res = list()
+	for _, args in tokenizeOptions(text, fn, encoding):
+		if args[0] == "include" and "include" not in __plans:
+			for rp in _includePaths(fn, args[1:]):
+				include(rp)
+			continue
+		cmd_name, binding = _bind(fn, lidx, args)
+		__options[cmd_name](*binding)
+		res.append(cmd_name)
+	return res
+
+
+reload_t = namedtuple("reload_t", "filename applied removed errors")
+
+
+class _Inotify:
+	"""Minimal inotify binding: waits for changes in a set of directories"""
+	# IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO,
+	# IN_CREATE, IN_DELETE
+	mask = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+	def __init__(s):
+		import ctypes
+		s._libc = ctypes.CDLL(None, use_errno=True)
+		s._get_errno = ctypes.get_errno
+		s.fd = s._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+		if s.fd < 0:
+			raise OSError(s._get_errno(), "inotify_init1 failed")
+		s._dirs = set()
+
+	def watch(s, dn):
+		"""returns whether dn was not watched before"""
+		if dn in s._dirs: return False
+		if s._libc.inotify_add_watch(s.fd, os.fsencode(dn), s.mask) < 0:
+			raise OSError(s._get_errno(), f"cannot watch {dn}")
+		s._dirs.add(dn)
+		return True
+
+	def wait(s, timeout):
+		import select
+		if len(select.select([s.fd], [], [], timeout)[0]) < 1: return False
+		# let writers finish, then drop the queued events
+		time.sleep(0.02)
+		while True:
+			try:
+				if not os.read(s.fd, 1 << 16): break
+			except BlockingIOError:
+				break
+		return True
+
+	def close(s):
+		os.close(s.fd)
+
+
+class OptionWatcher:
+	"""Watches every file loadOptions applied and re-applies the option lines
+	that changed. Lines are compared by hash, so only changed and inserted
+	lines are tokenized, converted and applied. Removed lines cannot be undone
+	and are only reported. check() polls once; start() runs a thread waiting
+	on inotify (or polling every interval seconds where inotify is not
+	available) that calls check() and passes non-empty results to callback.
+	Handlers then run on that thread."""
+	def __init__(s, callback=None, interval=1.0, encoding=None):
+		s.callback = callback
+		s.interval = interval
+		s.encoding = encoding or locale.getpreferredencoding(False)
+		s._lines = dict()
+		s._thread = None
+		s._stop = None
+		for rp, (fn, sig) in loadedFiles().items():
+			if _fileSignature(rp) == sig:
+				s._lines[rp] = s._read(rp)[1]
+
+	@staticmethod
+	def _read(rp):
+		with open(rp, "rb") as f:
+			lines = f.read().splitlines(keepends=True)
+		return lines, list(map(hash, lines))
+
+	def _changedLines(s, old, new):
+		"""indices of new lines not in old and of old lines not in new"""
+		import difflib
+		n0 = 0
+		n_max = min(len(old), len(new))
+		while n0 < n_max and old[n0] == new[n0]:
+			n0 += 1
+		n1 = 0
+		while n1 < n_max - n0 and old[-1 - n1] == new[-1 - n1]:
+			n1 += 1
+
+		inserted = list()
+		removed = list()
+		matcher = difflib.SequenceMatcher(None,
+		                                  old[n0:len(old) - n1],
+		                                  new[n0:len(new) - n1],
+		                                  autojunk=False)
+		for tag, i0, i1, j0, j1 in matcher.get_opcodes():
+			if tag == "equal": continue
+			removed.extend(range(n0 + i0, n0 + i1))
+			inserted.extend(range(n0 + j0, n0 + j1))
+		return inserted, removed
+
+	def _apply(s, fn, lidx, text, applied, errors):
+		def include(rp):
+			if rp not in loadedFiles():
+				s._applyFile(rp, rp, applied, errors)
+
+		try:
+			for cmd_name in _applyLine(fn, lidx, text, s.encoding, include):
+				applied.append((fn, lidx, cmd_name))
+		except opex as e:
+			errors.append(e)
+			logger.error(str(e))
+
+	def _applyFile(s, rp, fn, applied, errors):
+		"""applies all of a newly included file"""
+		_markLoaded(rp, fn, _fileSignature(rp))
+		try:
+			lines, hashes = s._read(rp)
+		except OSError as e:
+			errors.append(opex(f"cannot read config {fn}: {e.strerror}"))
+			return
+		s._lines[rp] = hashes
+		for i, ln in enumerate(lines):
+			s._apply(fn, i + 1, ln.decode(s.encoding), applied, errors)
+
+	def check(s):
+		"""re-applies changed lines of all loaded files, returns a reload_t per
+		changed file"""
+		res = list()
+		for rp, (fn, sig) in loadedFiles().items():
+			sig1 = _fileSignature(rp)
+			if sig1 == sig or sig1 is None: continue
+			_markLoaded(rp, fn, sig1)
+			try:
+				lines, hashes = s._read(rp)
+			except OSError:
+				continue
+			logger.info("reloading config %s", fn)
+			inserted, removed = s._changedLines(s._lines.get(rp, []), hashes)
+			s._lines[rp] = hashes
+			applied = list()
+			errors = list()
+			for i in inserted:
+				s._apply(fn, i + 1, lines[i].decode(s.encoding), applied, errors)
+			res.append(reload_t(fn, applied, [i + 1 for i in removed], errors))
+
+		if len(res) > 0 and s.callback is not None:
+			s.callback(res)
+		return res
+
+	def start(s):
+		import threading
+		if s._thread is not None: return s
+		s._stop = threading.Event()
+		s._thread = threading.Thread(target=s._run,
+		                             name="OptionWatcher",
+		                             daemon=True)
+		s._thread.start()
+		return s
+
+	def stop(s):
+		if s._thread is None: return
+		s._stop.set()
+		s._thread.join()
+		s._thread = None
+
+	def _run(s):
+		try:
+			inotify = _Inotify()
+		except (OSError, AttributeError) as e:
+			logger.debug("inotify unavailable, polling: %s", e)
+			inotify = None
+
+		try:
+			while not s._stop.is_set():
+				if inotify is None:
+					s._stop.wait(s.interval)
+				else:
+					try:
+						added = [inotify.watch(os.path.dirname(rp)) for rp in loadedFiles()]
+					except OSError as e:
+						logger.debug("inotify watch failed, polling: %s", e)
+						inotify.close()
+						inotify = None
+						continue
+					# changes before a directory was watched raised no event
+					if not any(added):
+						inotify.wait(s.interval)
+				if s._stop.is_set(): break
+				s.check()
+		finally:
+			if inotify is not None:
+				inotify.close()
+
+
+def watchOptions(callback=None, interval=1.0):
+	"""starts an OptionWatcher over the files loaded so far"""
+	return OptionWatcher(callback, interval).start()
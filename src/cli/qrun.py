@@ -1,9 +1,24 @@
+import os
 import sys
+import time
+import json
 
 commands = dict()
+groups = dict()
+# index: (input paths, output paths, indices of dependencies)
+declarations = dict()
+# file the hash database and the results of the last run are kept in,
+# defaults to one named after the main script below $XDG_CACHE_HOME/hakcli
+cache_file = None
 
 
-def qruncmd(index=None):
+def qruncmd(index=None, group=None, inputs=(), outputs=(), deps=()):
+	"""Registers a quick-run command. Commands sharing a group never run
+	concurrently and start in argv order. The commands listed in deps run
+	before this one. A command declaring inputs or outputs is skipped while
+	the contents of its inputs, the results of its dependencies and its
+	outputs are unchanged since it last succeeded. The result of a dependency
+	without outputs changes whenever it runs."""
 	global commands
 	if index is None:
 		for i in range(1, 13):
@@ -14,17 +29,330 @@ def qruncmd(index=None):
 	def wrapper(func):
 		global commands
 		commands[index] = func
+		if group is not None:
+			groups[index] = group
+		if len(inputs) > 0 or len(outputs) > 0 or len(deps) > 0:
+			declarations[index] = (tuple(inputs), tuple(outputs), tuple(deps))
 		return func
 
 	return wrapper
 
 
-def qrun():
+def _cache_file():
+	if cache_file is not None: return cache_file
+	import __main__
+	from .util.misc import cache_dir, path_digest
+	return cache_dir(f"qrun-{path_digest(__main__.__file__)}.json")
+
+
+def _load_cache():
+	try:
+		with open(_cache_file(), "r") as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return dict()
+
+
+def _save_cache(cache):
+	from .util.misc import write_replace
+	try:
+		write_replace(_cache_file(),
+		              lambda f: json.dump(cache, f, indent=1, sort_keys=True))
+	except OSError:
+		pass
+
+
+class HashDB:
+	"""Content hashes of files, recomputed only when size or mtime changed"""
+	def __init__(s, files):
+		# abspath: [size, mtime_ns, hex digest]
+		s.files = files
+
+	def digest(s, path):
+		"""hex digest of the file or directory tree at path, None if missing"""
+		import hashlib
+		import stat
+		path = os.path.abspath(path)
+		try:
+			st = os.stat(path)
+		except OSError:
+			s.files.pop(path, None)
+			return None
+
+		if stat.S_ISDIR(st.st_mode):
+			h = hashlib.sha256()
+			for name in sorted(os.listdir(path)):
+				h.update(os.fsencode(name) + b"\0")
+				h.update((s.digest(os.path.join(path, name)) or "-").encode() + b"\0")
+			return h.hexdigest()
+
+		entry = s.files.get(path)
+		if entry is not None and entry[:2] == [st.st_size, st.st_mtime_ns]:
+			return entry[2]
+
+		h = hashlib.sha256()
+		try:
+			with open(path, "rb") as f:
+				for chunk in iter(lambda: f.read(1 << 20), b""):
+					h.update(chunk)
+		except OSError:
+			return None
+		s.files[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+		return s.files[path][2]
+
+
+def _cpu_time():
+	t = os.times()
+	return t.user + t.system + t.children_user + t.children_system
+
+
+def _exit_status(e):
+	"""the exit status the interpreter would end with on SystemExit e"""
+	if e.code is None: return 0
+	if isinstance(e.code, int): return e.code
+	return 1
+
+
+def _run(index):
+	"""runs one command, returning its exit status, wall and cpu time"""
+	wall0, cpu0 = time.perf_counter(), _cpu_time()
+	status = 0
+	try:
+		commands[index]()
+	except SystemExit as e:
+		status = _exit_status(e)
+		if e.code is not None and not isinstance(e.code, int):
+			sys.stderr.write(f"{e.code}\n")
+	except Exception:
+		import traceback
+		traceback.print_exc()
+		status = 1
+	finally:
+		sys.stdout.flush()
+		sys.stderr.flush()
+	return status, time.perf_counter() - wall0, _cpu_time() - cpu0
+
+
+def _format_time(t):
+	return f"{t:.3f}s"
+
+
+def _schedule(indices):
+	"""indices in the given order, each preceded by those of its dependencies
+	not scheduled yet. Only dependencies are de-duplicated, an index given
+	twice runs twice."""
+	order = list()
+	state = dict()
+
+	def visit(index):
+		if state.get(index) == 2: return
+		if state.get(index) == 1:
+			sys.stderr.write(f"dependency cycle through {index}\n")
+			exit(1)
+		if index not in commands:
+			sys.stderr.write(f"unknown dependency {index}\n")
+			exit(1)
+		state[index] = 1
+		for dep in declarations.get(index, ((), (), ()))[2]:
+			visit(dep)
+		state[index] = 2
+		order.append(index)
+
+	for index in indices:
+		if state.get(index) == 2:
+			order.append(index)
+		else:
+			visit(index)
+	return order
+
+
+class Runner:
+	"""Executes a schedule, inline or on a process pool, skipping commands that
+	are up to date and those whose dependencies failed"""
+	def __init__(s, cache):
+		s.cache = cache
+		s.hashes = HashDB(cache.setdefault("files", dict()))
+		s.entries = cache.setdefault("commands", dict())
+		s.timings = cache.setdefault("timings", dict())
+		# position in the schedule: (index, state, status, wall, cpu)
+		s.results = dict()
+		# index: exit status of its latest run, None if it was blocked
+		s.status = dict()
+
+	def _stamp(s, index):
+		inputs, outputs, deps = declarations[index]
+		return {
+		  "inputs": {p: s.hashes.digest(p)
+		             for p in inputs},
+		  "deps": {str(d): s.entries.get(str(d), dict()).get("result")
+		           for d in deps}
+		}
+
+	def blocked(s, index):
+		inputs, outputs, deps = declarations.get(index, ((), (), ()))
+		return any(s.status[d] != 0 for d in deps)
+
+	def up_to_date(s, index):
+		"""checks whether index can be skipped, returns (skip, stamp)"""
+		if index not in declarations: return False, None
+		inputs, outputs, deps = declarations[index]
+		stamp = s._stamp(index)
+		if len(inputs) == 0 and len(outputs) == 0: return False, stamp
+		# a dependency without a recorded result counts as changed
+		if any(v is None for v in stamp["deps"].values()): return False, stamp
+		entry = s.entries.get(str(index))
+		if entry is None or entry.get("stamp") != stamp: return False, stamp
+		for p, digest in entry.get("outputs", dict()).items():
+			if digest is None or s.hashes.digest(p) != digest: return False, stamp
+		return True, stamp
+
+	def finish(s, pos, index, stamp, status, wall, cpu):
+		import hashlib
+		s.results[pos] = (index, "ran", status, wall, cpu)
+		s.status[index] = status
+		s.timings[str(index)] = {
+		  "status": status,
+		  "wall": wall,
+		  "cpu": cpu,
+		  "time": time.time()
+		}
+		if stamp is None: return
+		if status != 0:
+			s.entries.pop(str(index), None)
+			return
+
+		outputs = {p: s.hashes.digest(p) for p in declarations[index][1]}
+		if len(outputs) > 0:
+			result = json.dumps(sorted(outputs.items()))
+		else:
+			result = repr(time.time())
+		s.entries[str(index)] = {
+		  "stamp": stamp,
+		  "outputs": outputs,
+		  "result": hashlib.sha256(result.encode()).hexdigest()
+		}
+
+	def prepare(s, pos, index):
+		"""returns the stamp if index needs to run, records it as skipped and
+		returns False otherwise"""
+		if s.blocked(index):
+			s.results[pos] = (index, "blocked", None, 0.0, 0.0)
+			s.status[index] = None
+			return False
+		skip, stamp = s.up_to_date(index)
+		if skip:
+			s.results[pos] = (index, "up to date", 0, 0.0, 0.0)
+			s.status[index] = 0
+			return False
+		return stamp
+
+	def run_inline(s, order):
+		"""runs the schedule one command after another, the first exception or
+		non-zero exit of a command is passed on"""
+		for pos, index in enumerate(order):
+			stamp = s.prepare(pos, index)
+			if stamp is False: continue
+			wall0, cpu0 = time.perf_counter(), _cpu_time()
+			status = 1
+			try:
+				commands[index]()
+				status = 0
+			except SystemExit as e:
+				status = _exit_status(e)
+				raise
+			finally:
+				s.finish(pos, index, stamp, status,
+				         time.perf_counter() - wall0, _cpu_time() - cpu0)
+
+	def run_parallel(s, order, jobs):
+		import multiprocessing
+		from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+		jobs = jobs or os.cpu_count()
+		pending = list(range(len(order)))
+		running = dict()
+		busy = set()
+
+		sys.stdout.flush()
+		sys.stderr.flush()
+		with ProcessPoolExecutor(
+		  max_workers=jobs,
+		  mp_context=multiprocessing.get_context("fork")) as pool:
+			while len(pending) > 0 or len(running) > 0:
+				# start what is ready; a group starts its members in order and an
+				# index given twice does not run concurrently with itself
+				waiting = set()
+				active = {index for pos, index, stamp in running.values()}
+				for pos in list(pending):
+					if len(running) >= jobs: break
+					index = order[pos]
+					group = groups.get(index)
+					if group is not None and (group in busy or group in waiting):
+						continue
+					deps = declarations.get(index, ((), (), ()))[2]
+					if index in active or any(d not in s.status for d in deps):
+						if group is not None: waiting.add(group)
+						active.add(index)
+						continue
+					pending.remove(pos)
+					stamp = s.prepare(pos, index)
+					if stamp is False: continue
+					running[pool.submit(_run, index)] = (pos, index, stamp)
+					active.add(index)
+					if group is not None: busy.add(group)
+
+				if len(running) < 1: continue
+				done, _ = wait(running, return_when=FIRST_COMPLETED)
+				for future in done:
+					pos, index, stamp = running.pop(future)
+					busy.discard(groups.get(index))
+					s.finish(pos, index, stamp, *future.result())
+
+	def summary(s, order):
+		from .util.printers import TablePrinter
+		tp = TablePrinter()
+		tp.addRow("index", "command", "state", "status", "wall", "cpu")
+		for pos in range(len(order)):
+			index, state, status, wall, cpu = s.results[pos]
+			tp.addRow(index, commands[index].__name__, state,
+			          "-" if status is None else status, _format_time(wall),
+			          _format_time(cpu))
+		return str(tp)
+
+
+def describe():
+	timings = _load_cache().get("timings", dict())
+	for index in sorted(commands):
+		t = timings.get(str(index))
+		if t is None:
+			print(index)
+		else:
+			print(f"{index} status {t['status']} wall {_format_time(t['wall'])} "
+			      f"cpu {_format_time(t['cpu'])}")
+
+
+def qrun(jobs=None):
+	"""Runs the commands whose indices are given in argv after their
+	dependencies, `describe` lists them with the timings recorded by the
+	last run. Without -j, commands run one after another and the first
+	failing one ends the program with its exit status. With -j N (or jobs) up
+	to N commands run on a process pool, commands whose dependencies failed
+	are skipped, a summary table is printed and the program exits with the
+	status of the first failed command; N=0 uses one worker per CPU. The
+	hash database and timings are only kept for -j runs and schedules
+	containing commands with declarations."""
 	global commands
-	for arg in sys.argv[1:]:
+	indices = list()
+	args = iter(sys.argv[1:])
+	for arg in args:
 		if arg == "describe":
-			for index in sorted(commands):
-				print(index)
+			describe()
+		elif arg[:2] == "-j" or arg == "--jobs":
+			v = arg[2:] if arg[:2] == "-j" and len(arg) > 2 else next(args, None)
+			try:
+				jobs = int(v)
+			except (TypeError, ValueError):
+				exit(1)
 		else:
 			try:
 				index = int(arg)
@@ -32,4 +360,28 @@ def qrun():
 				exit(1)
 			if index not in commands:
 				exit(1)
+			indices.append(index)
+
+	if len(indices) < 1: return
+
+	order = _schedule(indices)
+	if jobs is None and not any(index in declarations for index in order):
+		for index in order:
 			commands[index]()
+		return
+
+	runner = Runner(_load_cache())
+	try:
+		if jobs is None:
+			runner.run_inline(order)
+		else:
+			runner.run_parallel(order, jobs)
+	finally:
+		_save_cache(runner.cache)
+
+	if jobs is None: return
+	print(runner.summary(order), end="")
+	for pos in range(len(order)):
+		status = runner.results[pos][2]
+		if status is not None and status != 0:
+			exit(status)
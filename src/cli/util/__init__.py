@@ -1,5 +1,34 @@
-from .printers import TablePrinter,WrappedPrinter
-from .output import werror, wwarn
-from .types import Bool,file_path,dir_path,new_dir_path,new_file_path,Regex
-from .logging import ALPFormatter,configureLogging
-from .misc import fn_main
\ No newline at end of file
+# names are resolved on first access (PEP 562) so that importing the package
+# does not pull in logging, datetime, pathlib and friends
+__lazy = {
+  "TablePrinter": ".printers",
+  "WrappedPrinter": ".printers",
+  "werror": ".output",
+  "wwarn": ".output",
+  "Bool": ".types",
+  "file_path": ".types",
+  "dir_path": ".types",
+  "new_dir_path": ".types",
+  "new_file_path": ".types",
+  "Regex": ".types",
+  "path_kind": ".types",
+  "clear_stat_cache": ".types",
+  "ALPFormatter": ".logging",
+  "configureLogging": ".logging",
+  "fn_main": ".misc",
+}
+
+__all__ = list(__lazy)
+
+
+def __getattr__(name):
+	if name not in __lazy:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	import importlib
+	value = getattr(importlib.import_module(__lazy[name], __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
@@ -1,5 +1,135 @@
 import os
-import pathlib
-import __main__
 
-fn_main = pathlib.Path(os.path.dirname(os.path.realpath(__main__.__file__)))
\ No newline at end of file
+
+def __getattr__(name):
+	# fn_main is resolved on first use, realpath is not free
+	if name == "fn_main":
+		import pathlib
+		import __main__
+		global fn_main
+		fn_main = pathlib.Path(os.path.dirname(os.path.realpath(__main__.__file__)))
+		return fn_main
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def cache_dir(*names):
+	"""path below the per-user cache directory of hakcli"""
+	return os.path.join(
+	  os.path.expanduser(os.getenv("XDG_CACHE_HOME", "~/.cache")), "hakcli", *names)
+
+
+def path_digest(fn):
+	"""short digest of the real path of fn, for naming per-file cache entries"""
+	import hashlib
+	return hashlib.sha1(os.fsencode(os.path.realpath(fn))).hexdigest()[:16]
+
+
+def write_replace(fn, dump, mode="w"):
+	"""writes fn by calling dump with a temporary file that replaces fn once
+	dump returned, so readers never see a partial file. Exceptions are
+	passed on after the temporary file was removed."""
+	dn = os.path.dirname(fn)
+	if len(dn) > 0:
+		os.makedirs(dn, exist_ok=True)
+	fn_tmp = f"{fn}.{os.getpid()}.tmp"
+	try:
+		with open(fn_tmp, mode) as f:
+			dump(f)
+		os.replace(fn_tmp, fn)
+	except BaseException:
+		try:
+			os.unlink(fn_tmp)
+		except OSError:
+			pass
+		raise
+
+
+def recv_all(conn):
+	chunks = list()
+	while True:
+		chunk = conn.recv(1 << 16)
+		if not chunk: break
+		chunks.append(chunk)
+	return b"".join(chunks)
+
+
+def runtime_dir():
+	"""per-user directory for sockets of long-running helper processes"""
+	dn = os.getenv("XDG_RUNTIME_DIR")
+	if dn is None or not os.path.isdir(dn):
+		dn = os.path.join(os.getenv("TMPDIR", "/tmp"), f"hakcli-{os.getuid()}")
+		os.makedirs(dn, mode=0o700, exist_ok=True)
+		st = os.lstat(dn)
+		if st.st_uid != os.getuid() or st.st_mode & 0o077:
+			raise PermissionError(f"insecure runtime directory: {dn}")
+	return dn
+
+
+def runtime_socket(script, kind):
+	"""path of the unix socket a helper process of the given kind listens on for
+	script"""
+	return os.path.join(runtime_dir(), f"hakcli-{kind}-{path_digest(script)}.sock")
+
+
+def serve_forking(script, kind, handle, idle_timeout=None):
+	"""Listens on runtime_socket(script, kind) until idle_timeout seconds pass
+	without a connection and returns None. Every connection is handled by
+	handle(conn) in a forked child; if handle returns, its result is returned
+	from serve_forking in that child. When the script's mtime changes the
+	server re-executes itself."""
+	import sys
+	import signal
+	import socket
+
+	mtime = os.stat(script).st_mtime
+	path = runtime_socket(script, kind)
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		os.unlink(path)
+	except FileNotFoundError:
+		pass
+	sock.bind(path)
+	os.chmod(path, 0o600)
+	sock.listen(64)
+	sock.settimeout(idle_timeout)
+
+	signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+	signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+	child = False
+	try:
+		while True:
+			try:
+				conn, _ = sock.accept()
+			except socket.timeout:
+				return None
+			conn.settimeout(None)
+
+			if os.stat(script).st_mtime != mtime:
+				# stale tree: drop the connection (the client falls back) and restart
+				conn.close()
+				sock.close()
+				os.unlink(path)
+				sys.stdout.flush()
+				os.execv(sys.executable, [sys.executable] + sys.argv)
+
+			sys.stdout.flush()
+			sys.stderr.flush()
+			if os.fork() == 0:
+				child = True
+				sock.close()
+				signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+				signal.signal(signal.SIGTERM, signal.SIG_DFL)
+				try:
+					return handle(conn)
+				except BaseException:
+					os._exit(1)
+			conn.close()
+	finally:
+		if not child:
+			sock.close()
+			try:
+				os.unlink(path)
+			except OSError:
+				pass
@@ -151,10 +151,11 @@ class TablePrinter:
 
 
 class WrappedPrinter:
-	def __init__(s, f, indent):
-		line_width = 80
-		if f == sys.stdout or f == sys.stderr:
-			line_width = shutil.get_terminal_size((line_width, 20)).columns
+	def __init__(s, f, indent, line_width=None):
+		if line_width is None:
+			line_width = 80
+			if f == sys.stdout or f == sys.stderr:
+				line_width = shutil.get_terminal_size((line_width, 20)).columns
 
 		indent_str = '  ' * indent
 
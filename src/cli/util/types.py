@@ -1,5 +1,7 @@
 import os
 import re
+import stat
+import threading
 
 class Bool:
 	def __init__(s, v):
@@ -40,45 +42,140 @@ def Regex(s: str):
 
 	return re.compile(pattern,flags)
 
+__dir_entries = dict()
+__path_kinds = dict()
+__scan_locks = dict()
+
+
+def clear_stat_cache():
+	"""forgets all cached file system lookups, e.g. after creating files.
+	CLINode.reset() calls it, other long-running processes must do so
+	themselves whenever the file system may have changed."""
+	global __dir_entries, __path_kinds
+	__dir_entries.clear()
+	__path_kinds.clear()
+
+
+def _stat_kind(fn):
+	try:
+		mode = os.stat(fn).st_mode
+	except (OSError, ValueError):
+		return None
+	if stat.S_ISREG(mode): return "file"
+	if stat.S_ISDIR(mode): return "dir"
+	return "other"
+
+
+def _scan_dir(dn):
+	global __dir_entries, __scan_locks
+	entries = __dir_entries.get(dn, False)
+	if entries is not False: return entries
+
+	with __scan_locks.setdefault(dn, threading.Lock()):
+		entries = __dir_entries.get(dn, False)
+		if entries is not False: return entries
+		try:
+			with os.scandir(dn) as it:
+				entries = {e.name: e for e in it}
+		except OSError:
+			entries = None
+		__dir_entries[dn] = entries
+		return entries
+
+
+def path_kind(fn):
+	"""Classifies fn as "file", "dir", "other" or None if it does not exist,
+	following symlinks. The parent directory is listed once with os.scandir and
+	shared by all lookups of its entries, so only symlinks and paths in
+	unlistable directories cost a stat call of their own. Results are kept
+	for the life of the process until clear_stat_cache() is called, so files
+	created or removed afterwards are not noticed."""
+	global __path_kinds
+
+	if fn == "": return None
+	if not os.path.isabs(fn):
+		fn = os.path.join(os.getcwd(), fn)
+
+	kind = __path_kinds.get(fn, False)
+	if kind is not False: return kind
+
+	dn, fb = os.path.split(fn)
+	entries = None
+	if fb not in ("", ".", ".."):
+		entries = _scan_dir(dn)
+
+	if entries is None:
+		kind = _stat_kind(fn)
+	else:
+		entry = entries.get(fb)
+		if entry is None:
+			kind = None
+		elif entry.is_symlink():
+			kind = _stat_kind(fn)
+		elif entry.is_dir():
+			kind = "dir"
+		elif entry.is_file():
+			kind = "file"
+		else:
+			kind = "other"
+
+	__path_kinds[fn] = kind
+	return kind
+
+
 def file_path(s):
 	"""path to an existing file in the file system"""
 
-	if not os.path.exists(s):
+	kind = path_kind(s)
+	if kind is None:
 		raise ValueError(f"file does not exist: {s}")
 
-	if not os.path.isfile(os.path.realpath(s)):
+	if kind != "file":
 		raise ValueError(f"path target is not a file: {s}")
 
 	return s
 
 
+file_path.io_bound = True
+
+
 def dir_path(s):
 	"""path to an existing directory in the file system"""
 
-	if not os.path.exists(s):
+	kind = path_kind(s)
+	if kind is None:
 		raise ValueError(f"file does not exist: {s}")
 
-	if not os.path.isdir(os.path.realpath(s)):
+	if kind != "dir":
 		raise ValueError(f"path target is not a directory: {s}")
 
 	return s
 
 
+dir_path.io_bound = True
+
+
 def new_dir_path(s):
 	"""path to an existing directory or a viable new directory in the file system"""
 
-	if os.path.exists(s):
-		if not os.path.isdir(os.path.realpath(s)):
-			raise ValueError(f"path target is not a directory: {s}")
+	kind = path_kind(s)
+	if kind is not None and kind != "dir":
+		raise ValueError(f"path target is not a directory: {s}")
 
 	return s
 
 
+new_dir_path.io_bound = True
+
+
 def new_file_path(s):
 	"""path to an existing directory or a viable new directory in the file system"""
 
-	if os.path.exists(s):
-		if not os.path.isfile(os.path.realpath(s)):
-			raise ValueError(f"path target is not a file: {s}")
+	kind = path_kind(s)
+	if kind is not None and kind != "file":
+		raise ValueError(f"path target is not a file: {s}")
 
 	return s
+
+
+new_file_path.io_bound = True
@@ -0,0 +1,154 @@
+"""Zygote server running whole invocations from a preloaded CLINode tree.
+
+Start it with `prog --zygote-server` and invoke the program as `python3 -m
+cli.zygote prog args...` instead of `prog args...`. Every invocation is run
+by a child forked from the server that takes over the client's argv,
+environment, working directory and stdin/stdout/stderr, and then continues
+the script after process() as if it had been started directly. Signals the
+client receives are forwarded to it and its exit status is reported back.
+Without a running server the client falls back to running the program
+itself.
+
+The child does not belong to the client's terminal session, so it cannot be
+made the foreground job: programs reading interactively from a terminal
+should not be run through the zygote."""
+import os
+import sys
+import socket
+import array
+
+kind = "zygote"
+# request: "+" carrying the fds, then cwd, argc, argv and the environment
+# as NUL-separated records. reply: pid line, wait status line
+
+
+def _recv_request(conn):
+	fds = array.array("i")
+	msg, ancdata, flags, addr = conn.recvmsg(
+	  1, socket.CMSG_SPACE(3 * fds.itemsize))
+	for level, type, data in ancdata:
+		if level == socket.SOL_SOCKET and type == socket.SCM_RIGHTS:
+			fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+	if msg != b"+" or len(fds) != 3:
+		raise ConnectionError("malformed request")
+
+	from .util.misc import recv_all
+	records = recv_all(conn).split(b"\0")
+	cwd = records[0]
+	argc = int(records[1])
+	argv = [os.fsdecode(v) for v in records[2:2 + argc]]
+	env = dict(v.split(b"=", 1) for v in records[2 + argc:] if b"=" in v)
+	return list(fds), cwd, argv, env
+
+
+def _spawn(conn):
+	"""Runs in a child of the server. Forks the worker, which returns the
+	client's argv, and waits for it to report its status to the client."""
+	import signal
+
+	fds, cwd, argv, env = _recv_request(conn)
+	pid = os.fork()
+	if pid == 0:
+		signal.signal(signal.SIGTERM, signal.SIG_DFL)
+		conn.close()
+		for i, fd in enumerate(fds):
+			os.dup2(fd, i)
+			os.close(fd)
+		os.chdir(cwd)
+		os.environb.clear()
+		os.environb.update(env)
+		sys.argv[:] = argv
+		if hasattr(sys.stdout, "reconfigure"):
+			sys.stdout.reconfigure(line_buffering=os.isatty(1))
+		return argv
+
+	code = 1
+	try:
+		for fd in fds:
+			os.close(fd)
+		conn.sendall(b"%d\n" % pid)
+		status = os.waitpid(pid, 0)[1]
+		conn.sendall(b"%d\n" % status)
+		code = 0
+	finally:
+		os._exit(code)
+
+
+def serve(script=None, idle_timeout=None):
+	"""Listens on the per-user socket for script until idle_timeout seconds pass
+	without an invocation and returns None. In the worker forked for an
+	invocation it returns the client's argv instead. When the script's mtime
+	changes the server re-executes itself."""
+	from .util.misc import serve_forking
+
+	if script is None:
+		script = os.path.realpath(sys.modules["__main__"].__file__)
+	return serve_forking(script, kind, _spawn, idle_timeout)
+
+
+def run(script, argv):
+	"""Runs script argv in a running server and returns its wait status, None if
+	no server accepted the invocation."""
+	import signal
+	from .util.misc import runtime_socket
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(runtime_socket(script, kind))
+		sock.sendmsg([b"+"], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+		                       array.array("i", (0, 1, 2)))])
+		sock.sendall(b"\0".join([os.fsencode(os.getcwd()), b"%d" %
+		                         (len(argv) + 1), os.fsencode(script)] +
+		                        [os.fsencode(v) for v in argv] +
+		                        [k + b"=" + v for k, v in os.environb.items()]))
+		sock.shutdown(socket.SHUT_WR)
+		replies = sock.makefile("rb")
+		pid = replies.readline()
+	except OSError:
+		sock.close()
+		return None
+	if not pid.endswith(b"\n"):
+		sock.close()
+		return None
+
+	pid = int(pid)
+
+	def forward(sig, frame):
+		os.kill(pid, sig)
+
+	for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT):
+		signal.signal(sig, forward)
+
+	try:
+		status = replies.readline()
+	finally:
+		sock.close()
+	if not status.endswith(b"\n"):
+		return 1 << 8
+	return int(status)
+
+
+def main(argv=sys.argv):
+	if len(argv) < 2:
+		sys.stderr.write(f"usage: {argv[0]} SCRIPT [ARGS...]\n")
+		sys.exit(2)
+
+	script, args = argv[1], argv[2:]
+	status = run(script, args)
+	if status is not None:
+		if os.WIFSIGNALED(status):
+			import signal
+			sig = os.WTERMSIG(status)
+			signal.signal(sig, signal.SIG_DFL)
+			os.kill(os.getpid(), sig)
+		sys.exit(os.WEXITSTATUS(status))
+
+	sys.stdout.flush()
+	try:
+		os.execv(script, [script] + args)
+	except OSError:
+		os.execv(sys.executable, [sys.executable, script] + args)
+
+
+if __name__ == "__main__":
+	main()